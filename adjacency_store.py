@@ -0,0 +1,104 @@
+from typing import List, Dict, Iterator, Optional
+from collections import OrderedDict
+from collections.abc import Mapping as MappingABC
+import os
+import sqlite3
+import sys
+
+
+LINK_SEPARATOR = '\n'
+
+
+class AdjacencyStore(MappingABC):
+    """
+    graph의 adjacency를 SQLite 파일에 저장하고, node의 link를 필요할 때 하나씩 읽어오는 disk 기반 graph.
+    graph 전체를 메모리에 올리지 않으므로 query가 건드리는 주변 node만 읽고, 연결만 열면 되어 시작이 빠르다.
+    읽은 adjacency는 cache_size개까지 LRU cache에 둔다.
+
+    Mapping을 구현하므로 SearchQuery, TreeToGraph에서 dict graph 대신 사용할 수 있다.
+    store[title] -> List[str], title in store, store.keys(), len(store)
+    """
+    def __init__(self, path: str, cache_size: int = 100000) -> None:
+        """
+        :param path: build로 만든 SQLite 파일 경로
+        :param cache_size: LRU cache에 둘 adjacency 수 (0이면 cache 하지 않음)
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.cache_size = cache_size
+        self.cache: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._length: Optional[int] = None
+        self.connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+
+    @staticmethod
+    def build(path: str, graph: Dict, batch_size: int = 10000) -> None:
+        """
+        dict graph를 SQLite 파일로 저장한다. 임시 파일에 쓴 뒤 교체하므로, 열려 있는 store는 영향을 받지 않는다.
+        :param path: 저장할 SQLite 파일 경로
+        :param graph: {title: links}
+        :param batch_size: 한 번에 insert 할 row 수
+        """
+        tmp_path = path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        connection = sqlite3.connect(tmp_path)
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.execute('CREATE TABLE adjacency (title TEXT NOT NULL, links TEXT NOT NULL)')
+        batch: List = []
+        for title, links in graph.items():
+            batch.append((title, LINK_SEPARATOR.join(links)))
+            if len(batch) >= batch_size:
+                connection.executemany('INSERT INTO adjacency VALUES (?, ?)', batch)
+                batch = []
+        connection.executemany('INSERT INTO adjacency VALUES (?, ?)', batch)
+        # index는 insert가 끝난 뒤 한 번에 만드는 것이 row마다 갱신하는 것보다 빠르다.
+        connection.execute('CREATE UNIQUE INDEX adjacency_title ON adjacency (title)')
+        connection.commit()
+        connection.close()
+        os.replace(tmp_path, path)
+        sys.stdout.write(f'Adjacency Store: {len(graph)} nodes\n')
+
+    def __getitem__(self, title: str) -> List[str]:
+        links = self.get(title)
+        if links is None:
+            raise KeyError(title)
+        return links
+
+    def get(self, title: str, default=None):
+        if title in self.cache:
+            self.cache.move_to_end(title)
+            self.hits += 1
+            return self.cache[title]
+        self.misses += 1
+        row = self.connection.execute('SELECT links FROM adjacency WHERE title = ?', (title,)).fetchone()
+        if row is None:
+            return default
+        links: List[str] = row[0].split(LINK_SEPARATOR) if row[0] else []
+        if self.cache_size:
+            self.cache[title] = links
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return links
+
+    def __contains__(self, title) -> bool:
+        if title in self.cache:
+            return True
+        row = self.connection.execute('SELECT 1 FROM adjacency WHERE title = ?', (title,)).fetchone()
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for title, in self.connection.execute('SELECT title FROM adjacency ORDER BY rowid'):
+            yield title
+
+    def __len__(self) -> int:
+        if self._length is None:
+            self._length = self.connection.execute('SELECT COUNT(*) FROM adjacency').fetchone()[0]
+        return self._length
+
+    def close(self):
+        self.connection.close()
+        self.cache.clear()
@@ -0,0 +1,478 @@
+"""
+성능 측정 스크립트
+python benchmark.py <benchmark> [options]
+
+codecs: 압축 형식별 dump end-to-end 읽기 처리량 비교
+markup: PatternMatching.scan과 기존 get_links, get_text, get_hierarchy 비교
+tfidf: TF-IDF 행렬 binary CSR 저장과 Matrix Market(.mtx) 저장/불러오기 비교
+graph: graph.pkl, graph.bin(mmap), graph.sqlite(lazy adjacency)의 load 시간, 메모리(RSS) 비교
+index: index.txt, redirect.txt 파싱과 index.bin, redirect.bin(mmap)의 시작 시간, 메모리(RSS), 조회 시간 비교
+pagerank: nx.pagerank와 CSRGraph.pagerank(scipy power iteration)의 시간, 최대 메모리(RSS), 결과 차이 비교
+build: GraphModeling의 edge별 add_edge, add_edges_from 한 번, CSRGraph.to_networkx, CSRGraph만 만들 때의 시간, 메모리 비교
+"""
+from typing import Dict, List
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import itertools
+import json
+import subprocess
+import sys
+import time
+
+from extract import ExtractWikiData, zstandard
+from transform import PatternMatching
+
+
+def benchmark_codecs(json_path: str, codecs: List[str], n_workers: int = 1, max_bytes: int = 0) -> Dict[str, float]:
+    """
+    압축되지 않은 dump를 각 codec으로 압축한 뒤, ExtractWikiData로 모든 document를 읽는 시간을 비교한다.
+    처리량은 압축 해제 기준 MB/s로 계산한다.
+    :param json_path: 압축되지 않은 dump 경로
+    :param codecs: 'raw', 'gzip', 'bz2', 'xz', 'zstd' 중 비교할 codec
+    :param n_workers: ExtractWikiData의 n_workers
+    :param max_bytes: 0이 아니면 dump의 앞부분만 잘라서 측정 (마지막 item 경계까지)
+    :return: Dict[str, float] codec별 MB/s
+    """
+    if max_bytes:
+        json_path = _truncate_dump(json_path, max_bytes)
+    raw_size: int = os.path.getsize(json_path)
+    openers = {'gzip': ('.gz', gzip.open), 'bz2': ('.bz2', bz2.open), 'xz': ('.xz', lzma.open)}
+    if zstandard is not None:
+        openers['zstd'] = ('.zst', lambda path, mode: zstandard.ZstdCompressor().stream_writer(open(path, mode)))
+
+    throughput: Dict[str, float] = {}
+    for codec in codecs:
+        if codec == 'raw':
+            path = json_path
+        elif codec in openers:
+            extension, opener = openers[codec]
+            path = json_path + extension
+            if not os.path.exists(path):
+                sys.stdout.write(f'Compressing {codec}..\n')
+                with open(json_path, 'rb') as src, opener(path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, 4 * 1024 * 1024)
+        else:
+            sys.stdout.write(f'Skip {codec}: not available\n')
+            continue
+
+        extract_wikidata = ExtractWikiData(directory='', n_workers=n_workers, json_path=path)
+        start = time.perf_counter()
+        n_docs = sum(len(documents) for _, documents in extract_wikidata.iter_shards())
+        elapsed = time.perf_counter() - start
+        throughput[codec] = raw_size / elapsed / 1024 / 1024
+        sys.stdout.write(f'{codec}: {os.path.getsize(path) / 1024 / 1024:.1f}MB on disk, {n_docs} docs, '
+                         f'{elapsed:.2f}s, {throughput[codec]:.1f}MB/s\n')
+    return throughput
+
+
+def benchmark_markup(json_path: str, n_docs: int = 10000, repeat: int = 3) -> float:
+    """
+    dump 앞부분 n_docs개의 document로 기존 함수와 scan의 처리 시간을 비교하고, 결과가 같은지 확인한다.
+    :return: float speedup (기존 / scan)
+    """
+    documents: List[str] = [doc.get('text', '') for doc in
+                            itertools.islice(ExtractWikiData(directory='', json_path=json_path), n_docs)]
+    pattern_matching = PatternMatching()
+
+    mismatch = 0
+    for doc in documents:
+        markup = pattern_matching.scan(doc)
+        if (markup.links != pattern_matching.get_links(doc) or markup.text != pattern_matching.get_text(doc)
+                or (markup.parents, markup.children, markup.relateds, markup.category)
+                != pattern_matching.get_hierarchy(doc)):
+            mismatch += 1
+    sys.stdout.write(f'Docs: {len(documents)}, {sum(map(len, documents)) / 1024 / 1024:.1f}MB, mismatch: {mismatch}\n')
+
+    def legacy():
+        for doc in documents:
+            pattern_matching.get_links(doc)
+            pattern_matching.get_text(doc)
+            pattern_matching.get_hierarchy(doc)
+
+    def scan():
+        for doc in documents:
+            pattern_matching.scan(doc)
+
+    legacy_time = min(_timeit(legacy) for _ in range(repeat))
+    scan_time = min(_timeit(scan) for _ in range(repeat))
+    sys.stdout.write(f'get_links + get_text + get_hierarchy: {legacy_time:.3f}s\n')
+    sys.stdout.write(f'scan: {scan_time:.3f}s ({legacy_time / scan_time:.2f}x)\n')
+    return legacy_time / scan_time
+
+
+GRAPH_LOADERS = {
+    'pickle': 'graph = file_manager.load_graph()',
+    'mmap': 'graph = file_manager.load_graph_binary()',
+    'sqlite': 'graph = file_manager.load_adjacency_store()',
+}
+
+GRAPH_LOAD_SCRIPT = '''
+import json, sys, time
+from file_manager import FileManager
+
+def rss():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * 4096
+
+file_manager = FileManager(sys.argv[1])
+before = rss()
+start = time.perf_counter()
+{loader}
+loaded = time.perf_counter() - start
+titles = list(graph.keys())[:{n_queries}]
+start = time.perf_counter()
+n_links = sum(len(graph[title]) for title in titles)
+queried = time.perf_counter() - start
+print(json.dumps({{'load': loaded, 'query': queried, 'rss': rss() - before, 'n_links': n_links}}))
+'''
+
+
+def benchmark_graph_load(dir_path: str, n_queries: int = 1000) -> Dict[str, Dict[str, float]]:
+    """
+    graph.pkl, graph.bin, graph.sqlite를 각각 새 process에서 열어 load 시간, 앞 n_queries개 document의 link 조회 시간,
+    load 전후 RSS 증가량을 비교한다. graph.bin, graph.sqlite가 없으면 graph.pkl로 만든다.
+    """
+    # subprocess는 repo directory(cwd)에서 실행하므로 dir_path를 절대 경로로 바꾸어 넘긴다.
+    dir_path = os.path.abspath(dir_path)
+    from file_manager import FileManager
+    file_manager = FileManager(dir_path)
+    if not os.path.exists(os.path.join(dir_path, file_manager.graph_binary_file_name)):
+        sys.stdout.write('Writing graph.bin..\n')
+        file_manager.save_graph_binary(file_manager.load_graph())
+    if not os.path.exists(os.path.join(dir_path, file_manager.adjacency_file_name)):
+        sys.stdout.write('Writing graph.sqlite..\n')
+        file_manager.save_adjacency_store(file_manager.load_graph())
+
+    results: Dict[str, Dict[str, float]] = {}
+    for kind, loader in GRAPH_LOADERS.items():
+        script = GRAPH_LOAD_SCRIPT.format(loader=loader, n_queries=n_queries)
+        output = subprocess.run([sys.executable, '-c', script, dir_path], check=True, capture_output=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), text=True).stdout
+        results[kind] = json.loads(output.strip().splitlines()[-1])
+        sys.stdout.write(f'{kind}: load {results[kind]["load"] * 1000:.1f}ms, '
+                         f'{n_queries} queries {results[kind]["query"] * 1000:.1f}ms, '
+                         f'RSS +{results[kind]["rss"] / 1024 / 1024:.1f}MB\n')
+    return results
+
+
+INDEX_LOADERS = {
+    'text': 'index = file_manager.load_index()\nredirect = file_manager.load_redirect()\n'
+            'resolver = RedirectResolver(redirect)',
+    'mmap': 'index = file_manager.load_title_index()\nresolver = redirect = file_manager.load_redirect_index()',
+}
+
+INDEX_LOAD_SCRIPT = '''
+import itertools, json, sys, time
+from file_manager import FileManager
+from linking import RedirectResolver
+
+def rss():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * 4096
+
+file_manager = FileManager(sys.argv[1])
+before = rss()
+start = time.perf_counter()
+{loader}
+loaded = time.perf_counter() - start
+titles = list(itertools.islice(index, {n_queries}))
+links = list(itertools.islice(redirect, {n_queries}))
+start = time.perf_counter()
+n_found = sum(len(index[title]) for title in titles) + sum(len(resolver.resolve(link)[1]) for link in links)
+queried = time.perf_counter() - start
+print(json.dumps({{'load': loaded, 'query': queried, 'rss': rss() - before, 'n_found': n_found}}))
+'''
+
+
+def benchmark_index_load(dir_path: str, n_queries: int = 10000) -> Dict[str, Dict[str, float]]:
+    """
+    index.txt, redirect.txt를 읽어 dict와 RedirectResolver를 만드는 기존 방식과 index.bin, redirect.bin을 mmap으로 여는 방식을
+    각각 새 process에서 실행하여 시작 시간, title n_queries개 location 조회와 redirect n_queries개 resolve 시간,
+    load 전후 RSS 증가량을 비교한다. index.bin, redirect.bin이 없으면 text 파일로 만든다.
+    """
+    # subprocess는 repo directory(cwd)에서 실행하므로 dir_path를 절대 경로로 바꾸어 넘긴다.
+    dir_path = os.path.abspath(dir_path)
+    from file_manager import FileManager
+    from linking import RedirectResolver
+    file_manager = FileManager(dir_path)
+    if not os.path.exists(os.path.join(dir_path, file_manager.title_index_file_name)):
+        sys.stdout.write('Writing index.bin..\n')
+        file_manager.save_title_index(file_manager.load_index())
+    if not os.path.exists(os.path.join(dir_path, file_manager.redirect_index_file_name)):
+        sys.stdout.write('Writing redirect.bin..\n')
+        file_manager.save_redirect_index(RedirectResolver(file_manager.load_redirect()))
+
+    results: Dict[str, Dict[str, float]] = {}
+    for kind, loader in INDEX_LOADERS.items():
+        script = INDEX_LOAD_SCRIPT.format(loader=loader, n_queries=n_queries)
+        output = subprocess.run([sys.executable, '-c', script, dir_path], check=True, capture_output=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), text=True).stdout
+        results[kind] = json.loads(output.strip().splitlines()[-1])
+        sys.stdout.write(f'{kind}: load {results[kind]["load"] * 1000:.1f}ms, '
+                         f'{n_queries} queries {results[kind]["query"] * 1000:.1f}ms, '
+                         f'RSS +{results[kind]["rss"] / 1024 / 1024:.1f}MB\n')
+    return results
+
+
+PAGERANK_ENGINES = {
+    'networkx': '''
+import networkx as nx
+G = nx.DiGraph()
+G.add_nodes_from(range(graph.n_nodes))
+G.add_edges_from(zip(np.repeat(np.arange(graph.n_nodes), graph.out_degree()).tolist(), graph.indices.tolist()))
+scores = nx.pagerank(G)
+pagerank = np.array([scores[i] for i in range(graph.n_nodes)])
+''',
+    'csr': 'pagerank = graph.pagerank()',
+}
+
+PAGERANK_SCRIPT = '''
+import json, resource, sys, time
+import numpy as np
+from file_manager import FileManager
+
+graph = FileManager(sys.argv[1]).load_graph_binary()
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+{engine}
+elapsed = time.perf_counter() - start
+np.save(sys.argv[2], pagerank)
+print(json.dumps({{'time': elapsed, 'rss': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) * 1024}}))
+'''
+
+
+def benchmark_pagerank(dir_path: str, engines: List[str]) -> Dict[str, Dict[str, float]]:
+    """
+    graph.bin에 대해 engine마다 새 process에서 PageRank를 구하고 시간과 최대 RSS 증가량을 비교한다.
+    networkx는 DiGraph를 만드는 시간과 메모리를 포함한다. 결과는 첫 engine과의 최대 차이(max_diff)로 비교한다.
+    graph.bin이 없으면 graph.pkl로 만든다.
+    """
+    # subprocess는 repo directory(cwd)에서 실행하므로 dir_path를 절대 경로로 바꾸어 넘긴다.
+    dir_path = os.path.abspath(dir_path)
+    import numpy as np
+    from file_manager import FileManager
+    file_manager = FileManager(dir_path)
+    if not os.path.exists(os.path.join(dir_path, file_manager.graph_binary_file_name)):
+        sys.stdout.write('Writing graph.bin..\n')
+        file_manager.save_graph_binary(file_manager.load_graph())
+
+    results: Dict[str, Dict[str, float]] = {}
+    reference = None
+    for engine in engines:
+        scores_path = os.path.join(dir_path, 'pagerank_%s.npy' % engine)
+        script = PAGERANK_SCRIPT.format(engine=PAGERANK_ENGINES[engine])
+        output = subprocess.run([sys.executable, '-c', script, dir_path, scores_path], check=True,
+                                capture_output=True, cwd=os.path.dirname(os.path.abspath(__file__)), text=True).stdout
+        results[engine] = json.loads(output.strip().splitlines()[-1])
+        pagerank = np.load(scores_path)
+        os.remove(scores_path)
+        if reference is None:
+            reference = pagerank
+        results[engine]['max_diff'] = float(np.abs(pagerank - reference).max(initial=0.0))
+        sys.stdout.write(f'{engine}: {results[engine]["time"]:.2f}s, RSS +{results[engine]["rss"] / 1024 / 1024:.1f}MB, '
+                         f'max diff {results[engine]["max_diff"]:.2e}\n')
+    return results
+
+
+GRAPH_BUILDERS = {
+    'add_edge': '''
+import networkx as nx
+G = nx.DiGraph()
+G.add_nodes_from(graph.keys())
+for node, edges in graph.items():
+    for edge in edges:
+        G.add_edge(node, edge)
+''',
+    'add_edges_from': '''
+import networkx as nx
+G = nx.DiGraph()
+G.add_nodes_from(graph.keys())
+G.add_edges_from((node, edge) for node, edges in graph.items() for edge in edges)
+''',
+    'to_networkx': 'G = CSRGraph.from_dict(graph).to_networkx()',
+    'csr': 'G = CSRGraph.from_dict(graph)',
+}
+
+GRAPH_BUILD_SCRIPT = '''
+import json, sys, time
+import numpy as np
+from file_manager import FileManager
+from graph import CSRGraph
+
+def rss():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * 4096
+
+n_docs = int(sys.argv[2])
+if n_docs:
+    # 평균 {avg_degree}개의 link, link 대상은 소수의 문서에 몰리는 power-law 분포
+    rng = np.random.default_rng(0)
+    n_titles = n_docs * 3 // 2
+    degrees = rng.poisson({avg_degree}, n_docs)
+    targets = np.minimum(rng.pareto(1.0, int(degrees.sum())) * n_docs / 100, n_titles - 1).astype(np.int64)
+    titles = ['문서 %d' % i for i in range(n_titles)]
+    bounds = np.concatenate(([0], np.cumsum(degrees))).tolist()
+    targets = targets.tolist()
+    graph = {{titles[i]: list(dict.fromkeys(titles[j] for j in targets[bounds[i]:bounds[i + 1]]))
+             for i in range(n_docs)}}
+else:
+    graph = FileManager(sys.argv[1]).load_graph()
+before = rss()
+start = time.perf_counter()
+{builder}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'time': elapsed, 'rss': rss() - before, 'n_docs': len(graph)}}))
+'''
+
+
+def benchmark_graph_build(dir_path: str, sizes: List[int], builders: List[str],
+                          avg_degree: int = 20) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    dict graph로부터 GraphModeling이 쓰는 graph를 만드는 시간과 RSS 증가량을 size, builder마다 새 process에서 잰다.
+    add_edge: 기존 edge별 G.add_edge, add_edges_from: 한 번의 G.add_edges_from, to_networkx: CSRGraph를 거쳐
+    edge 배열로 생성, csr: networkx 없이 CSRGraph만
+    :param sizes: 임의로 만든 graph의 document 수. 0이면 dir_path의 graph.pkl (전체 dump)
+    :param avg_degree: 임의 graph의 document당 평균 link 수
+    """
+    # subprocess는 repo directory(cwd)에서 실행하므로 dir_path를 절대 경로로 바꾸어 넘긴다.
+    dir_path = os.path.abspath(dir_path)
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for n_docs in sizes:
+        size = str(n_docs) if n_docs else 'full'
+        results[size] = {}
+        for builder in builders:
+            script = GRAPH_BUILD_SCRIPT.format(builder=GRAPH_BUILDERS[builder], avg_degree=avg_degree)
+            output = subprocess.run([sys.executable, '-c', script, dir_path, str(n_docs)], check=True,
+                                    capture_output=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                    text=True).stdout
+            results[size][builder] = json.loads(output.strip().splitlines()[-1])
+            sys.stdout.write(f'{size} ({results[size][builder]["n_docs"]} docs) {builder}: '
+                             f'{results[size][builder]["time"]:.2f}s, '
+                             f'RSS +{results[size][builder]["rss"] / 1024 / 1024:.1f}MB\n')
+    return results
+
+
+def benchmark_tfidf(dir_path: str, n_rows: int = 20000, n_cols: int = 100000, density: float = 0.001,
+                    repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    임의의 sparse 행렬을 binary CSR(save_tfidf)과 Matrix Market(save_tfidf_mtx)으로 저장하고 다시 읽어,
+    저장/불러오기 시간과 파일 크기를 비교한다. 읽은 행렬이 원래 행렬과 같은지도 확인한다.
+    """
+    import numpy as np
+    from scipy.sparse import coo_matrix
+    from file_manager import FileManager
+
+    file_manager = FileManager(dir_path)
+    query = 'benchmark'
+    generator = np.random.default_rng(0)
+    nnz = int(n_rows * n_cols * density)
+    matrix = coo_matrix((generator.random(nnz), (generator.integers(0, n_rows, nnz), generator.integers(0, n_cols, nnz))),
+                        shape=(n_rows, n_cols)).tocsr()
+    vocabulary: List[str] = ['term%d' % i for i in range(n_cols)]
+    sys.stdout.write(f'Matrix: {n_rows}x{n_cols}, {matrix.nnz} non-zeros\n')
+
+    paths = {'binary': os.path.join(dir_path, query + '_tfidf.bin'), 'mtx': os.path.join(dir_path, query + '.mtx')}
+    savers = {'binary': lambda: file_manager.save_tfidf(query, matrix, vocabulary),
+              'mtx': lambda: file_manager.save_tfidf_mtx(query, matrix)}
+    loaders = {'binary': lambda: file_manager.load_tfidf(query), 'mtx': lambda: file_manager.load_tfidf_mtx(query)}
+
+    results: Dict[str, Dict[str, float]] = {}
+    for kind in savers:
+        save_time = min(_timeit(savers[kind]) for _ in range(repeat))
+        load_time = min(_timeit(loaders[kind]) for _ in range(repeat))
+        loaded = loaders[kind]()
+        # 불러온 행렬로 실제 계산을 할 때의 시간 (mmap은 이때 disk에서 읽는다)
+        product_time = _timeit(lambda: loaded.dot(loaded[:100].T))
+        equal = (loaded != matrix).nnz == 0
+        results[kind] = {'save': save_time, 'load': load_time, 'product': product_time,
+                         'size': os.path.getsize(paths[kind])}
+        sys.stdout.write(f'{kind}: save {save_time:.3f}s, load {load_time:.3f}s, first product {product_time:.3f}s, '
+                         f'{results[kind]["size"] / 1024 / 1024:.1f}MB, equal: {equal}\n')
+    assert list(file_manager.load_tfidf_vocabulary(query)) == vocabulary
+    for path in paths.values():
+        os.remove(path)
+    return results
+
+
+def _timeit(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def _truncate_dump(json_path: str, max_bytes: int) -> str:
+    """
+    dump의 앞 max_bytes 근처 item 경계까지만 잘라 별도의 json 파일로 저장한다.
+    """
+    truncated_path = '%s.%d.json' % (os.path.splitext(json_path)[0], max_bytes)
+    if os.path.exists(truncated_path):
+        return truncated_path
+    extract_wikidata = ExtractWikiData(directory='', shard_size=max_bytes, json_path=json_path)
+    start, end = extract_wikidata._split_shards()[0]
+    with open(json_path, 'rb') as src, open(truncated_path, 'wb') as dst:
+        src.seek(start)
+        dst.write(b'[' + src.read(end - start).strip().rstrip(b']').rstrip().rstrip(b',') + b']')
+    return truncated_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Semantic Network Analysis in Namuwiki benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    codecs_parser = subparsers.add_parser('codecs', help='압축 형식별 dump 읽기 처리량')
+    codecs_parser.add_argument('--json-path', default='./data/namuwiki_20210301.json')
+    codecs_parser.add_argument('--codecs', nargs='+', default=['raw', 'gzip', 'bz2', 'xz', 'zstd'])
+    codecs_parser.add_argument('--workers', type=int, default=1)
+    codecs_parser.add_argument('--max-bytes', type=int, default=0)
+
+    markup_parser = subparsers.add_parser('markup', help='위키 문법 전처리 속도')
+    markup_parser.add_argument('--json-path', default='./data/namuwiki_20210301.json')
+    markup_parser.add_argument('--docs', type=int, default=10000)
+
+    tfidf_parser = subparsers.add_parser('tfidf', help='TF-IDF 행렬 저장 형식')
+    tfidf_parser.add_argument('--dir-path', default='./data/result')
+    tfidf_parser.add_argument('--rows', type=int, default=20000)
+    tfidf_parser.add_argument('--cols', type=int, default=100000)
+    tfidf_parser.add_argument('--density', type=float, default=0.001)
+
+    graph_parser = subparsers.add_parser('graph', help='graph.pkl, graph.bin, graph.sqlite load 시간, 메모리')
+    graph_parser.add_argument('--dir-path', default='./data/result')
+    graph_parser.add_argument('--queries', type=int, default=1000)
+
+    index_parser = subparsers.add_parser('index', help='index.txt, redirect.txt 파싱과 index.bin, redirect.bin 시작 시간, 메모리')
+    index_parser.add_argument('--dir-path', default='./data/result')
+    index_parser.add_argument('--queries', type=int, default=10000)
+
+    pagerank_parser = subparsers.add_parser('pagerank', help='nx.pagerank와 CSRGraph.pagerank 시간, 메모리')
+    pagerank_parser.add_argument('--dir-path', default='./data/result')
+    pagerank_parser.add_argument('--engines', nargs='+', choices=list(PAGERANK_ENGINES), default=list(PAGERANK_ENGINES))
+
+    build_parser = subparsers.add_parser('build', help='GraphModeling graph 생성 시간, 메모리')
+    build_parser.add_argument('--dir-path', default='./data/result')
+    build_parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 0],
+                              help='임의 graph의 document 수 (0이면 graph.pkl)')
+    build_parser.add_argument('--builders', nargs='+', choices=list(GRAPH_BUILDERS), default=list(GRAPH_BUILDERS))
+
+    args = parser.parse_args()
+    if args.benchmark == 'codecs':
+        benchmark_codecs(args.json_path, args.codecs, n_workers=args.workers, max_bytes=args.max_bytes)
+    elif args.benchmark == 'markup':
+        benchmark_markup(args.json_path, n_docs=args.docs)
+    elif args.benchmark == 'tfidf':
+        benchmark_tfidf(args.dir_path, n_rows=args.rows, n_cols=args.cols, density=args.density)
+    elif args.benchmark == 'graph':
+        benchmark_graph_load(args.dir_path, n_queries=args.queries)
+    elif args.benchmark == 'index':
+        benchmark_index_load(args.dir_path, n_queries=args.queries)
+    elif args.benchmark == 'pagerank':
+        benchmark_pagerank(args.dir_path, args.engines)
+    elif args.benchmark == 'build':
+        benchmark_graph_build(args.dir_path, args.sizes, args.builders)
+
+
+if __name__ == '__main__':
+    main()
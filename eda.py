@@ -2,12 +2,18 @@ from typing import Dict
 from collections import Counter
 import sys
 
+import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
 
+from graph import CSRGraph
+
 
 class EDA:
     def __init__(self, G):
+        """
+        :param G: dict graph, networkx graph 또는 CSRGraph (CSRGraph면 degree를 networkx 없이 배열로 센다)
+        """
         if isinstance(G, dict):
             self.G = nx.DiGraph(G)
         else:
@@ -21,6 +27,12 @@ class EDA:
         :param out_degree:
         :return:
         """
+        if isinstance(self.G, CSRGraph) and (total or in_degree or out_degree):
+            if total:
+                degrees = self.G.in_degree() + self.G.out_degree()
+            else:
+                degrees = self.G.in_degree() if in_degree else self.G.out_degree()
+            return np.sort(degrees).tolist()
         if total:
             return sorted([self.G.degree(n) for n in self.G.nodes()])
         elif in_degree:
@@ -36,7 +48,7 @@ class EDA:
         Plot a list of frequency of each degree value.
         :return:
         """
-        total_edges = self.G.number_of_edges()
+        total_edges = self.G.n_edges if isinstance(self.G, CSRGraph) else self.G.number_of_edges()
         print(total_edges)
         degrees = self.degree_count(total=True)
         in_degrees = self.degree_count(in_degree=True)
@@ -67,7 +79,7 @@ class EDA:
         plt.legend()
         plt.show()
 
-        all_degrees = [v for _, v in nx.degree(self.G)]
+        all_degrees = degrees
         plt.boxplot(all_degrees)
         plt.show()
 
@@ -1,42 +1,158 @@
-from typing import List, Dict, Tuple
-import pickle
+from typing import List, Dict, Tuple, Iterator, Callable, Optional
+from collections import deque
+from multiprocessing import Pool
+import argparse
+import bz2
+import gzip
+import io
+import lzma
+import os
+import re
 import sys
 
 import ijson
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 from transform import TransformData
 from file_manager import FileManager
 
 
+# namuwiki dump의 top-level item 경계: '},{"namespace":...'
+# 문자열 내부의 '"'는 escape 되므로 '{"namespace":'는 문자열 안에서 나올 수 없다. 문서가 '},{'로 끝나면 문자열을 닫는
+# '"'가 '{' 바로 뒤에 오지만, 닫는 '"' 다음에는 ',' 또는 '}'만 올 수 있으므로 첫 key까지 맞춰야 item 경계가 확실하다.
+ITEM_BOUNDARY = re.compile(rb'}\s*,\s*({)\s*"namespace"\s*:')
+
+COMPRESSIONS: Dict[str, str] = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz', '.lzma': 'xz', '.zst': 'zstd'}
+
+
+def get_compression(json_path: str) -> Optional[str]:
+    """
+    확장자로 dump의 압축 형식을 구한다. 압축되지 않은 dump면 None
+    """
+    return COMPRESSIONS.get(os.path.splitext(json_path)[1].lower())
+
+
+def open_dump(json_path: str):
+    """
+    dump를 binary file object로 연다. 압축된 dump는 읽는 만큼만 stream으로 압축을 해제한다.
+    """
+    compression = get_compression(json_path)
+    if compression is None:
+        return open(json_path, 'rb')
+    if compression == 'gzip':
+        return gzip.open(json_path, 'rb')
+    if compression == 'bz2':
+        return bz2.open(json_path, 'rb')
+    if compression == 'xz':
+        return lzma.open(json_path, 'rb')
+    if zstandard is None:
+        raise ImportError('zstd로 압축된 dump를 읽으려면 zstandard 패키지가 필요합니다.')
+    return zstandard.ZstdDecompressor().stream_reader(open(json_path, 'rb'), closefd=True)
+
+
+def _parse_shard(shard: Tuple[str, int, int]) -> List[Dict]:
+    """
+    dump의 [start, end) byte 구간(top-level item들)을 파싱하는 함수. process pool의 worker에서 실행된다.
+    :param shard: (json_path, start, end)
+    :return: List[Dict] 구간에 속한 document들 (원래 순서 유지)
+    """
+    json_path, start, end = shard
+    with open(json_path, 'rb') as json_file:
+        json_file.seek(start)
+        data: bytes = json_file.read(end - start)
+    return _parse_shard_bytes(data)
+
+
+def _parse_shard_bytes(data: bytes) -> List[Dict]:
+    """
+    top-level item들이 ','로 이어진 byte열을 파싱하는 함수. 압축된 dump는 main process에서 압축을 해제한 shard를 넘겨받는다.
+    :param data: item byte열
+    :return: List[Dict] 구간에 속한 document들 (원래 순서 유지)
+    """
+    data = data.strip()
+    if data.endswith(b']'):
+        data = data[:-1].rstrip()
+    data = data.rstrip(b',')
+
+    documents: List[Dict] = []
+    doc: Dict = {}
+    for prefix, event, value in ijson.parse(io.BytesIO(b'[' + data + b']')):
+        if prefix == 'item.title':
+            doc["title"] = value
+        if prefix == 'item.text':
+            doc["text"] = value
+            documents.append(doc)
+            doc = {}
+    return documents
+
+
 class ExtractWikiData:
     """
     namuwiki는 각 Document를 '나무위키 문법'을 포함하여 저장하고 있다.
     따라서 정제된 텍스트 데이터를 얻기 위해 데이터를 전처리를 하는 클래스이다.
 
     """
-    def __init__(self,directory: str,  max_docs: int = 10000, debug=False):
+    def __init__(self, directory: str, max_docs: int = 10000, debug=False, n_workers: int = 1,
+                 shard_size: int = 64 * 1024 * 1024, json_path: str = './data/namuwiki_20210301.json',
+                 max_pending_shards: int = 0):
+        """
+        :param directory: 결과를 저장할 directory path
+        :param max_docs: debug=True 일 경우 max_docs 만큼 진행
+        :param debug: debug 여부
+        :param n_workers: 1보다 크면 dump를 shard로 나누어 process pool에서 병렬로 파싱
+        :param shard_size: 한 shard의 대략적인 byte 크기
+        :param json_path: namuwiki dump json 경로. .gz, .bz2, .xz, .zst(zstandard 설치 시) 압축 dump도 읽을 수 있다.
+        :param max_pending_shards: 동시에 메모리에 올라와 있을 수 있는 shard 수 (0이면 2 * n_workers)
+        """
         self.max_docs: int = max_docs
         self.debug = debug
         self.directory = directory
+        self.n_workers = n_workers
+        self.shard_size = shard_size
+        self.json_path = json_path
+        self.max_pending_shards = max_pending_shards if max_pending_shards else 2 * n_workers
 
-        self.documents: List[Dict] = self.parse_namuwiki_json()
+    def __iter__(self) -> Iterator[Dict]:
+        return self.iter_documents()
 
     def parse_namuwiki_json(self) -> List[Dict]:
+        """
+        dump 전체를 List[Dict]로 읽어오는 함수. 전체 문서를 메모리에 올리므로 작은 dump나 debug 용도로만 사용한다.
+        큰 dump는 iter_documents()로 stream 처리해야 한다.
+        :return: List[Dict]
+        """
+        return list(self.iter_documents())
+
+    def iter_documents(self) -> Iterator[Dict]:
         """
         namuwiki DB dump한 json 파일을 파싱하는 과정. 메모리가 부족하여 ijson을 통해 generator (line-by-line)으로 읽는 함수.
         json 문서 구조는 List[Dict] 형식으로 구성됨.
         prefix: 해당 문서가 어떤 내용을 포함하고 있는지. ex) title, contributor, text..
         event:
         value: prefix가 포함하고 있는 내용
-        :param: max_docs: int debug=True 일 경우 max_docs 만큼 진행
-        :param: debug: Bool debug 여부
-        :return: List[Dict]
+        n_workers > 1 이면 dump를 shard로 나누어 병렬로 파싱하되, 원래 순서대로 yield 한다.
+        :return: Iterator[Dict] document generator
         """
-        json_path: str = './data/namuwiki_20210301.json'
-        namuwiki: List = []
-        with open(json_path, 'rb') as json_file:
+        doc_idx = 1
+        for doc in self._iter_raw_documents():
+            doc_idx += 1
+            yield doc
+            if doc_idx % self.max_docs == 0:
+                if self.debug:
+                    return
+                sys.stdout.write(f'Reading Json: {doc_idx}\n')
+
+    def _iter_raw_documents(self) -> Iterator[Dict]:
+        if self.n_workers > 1:
+            for _, documents in self.iter_shards():
+                yield from documents
+            return
+
+        with open_dump(self.json_path) as json_file:
             doc: Dict = {}
-            doc_idx = 1
             for prefix, event, value in ijson.parse(json_file):
                 """
                     TODO: 분류, 목차에 해당하는 Data Category를  진행해야 함.
@@ -45,26 +161,182 @@ class ExtractWikiData:
                     doc["title"] = value
                 if prefix == 'item.text':
                     doc["text"] = value
-                    doc_idx += 1
-                    namuwiki.append(doc)
+                    yield doc
                     doc: Dict = {}
-                    if doc_idx % self.max_docs == 0:
-                        if self.debug:
-                            break
-                        sys.stdout.write(f'Reading Json: {doc_idx}\n')
-        return namuwiki
+
+    def iter_shards(self, start_offset: int = 0) -> Iterator[Tuple[int, List[Dict]]]:
+        """
+        dump를 top-level item 단위의 byte 구간(shard)으로 나눈 뒤, 각 shard를 파싱하여 (shard의 끝 offset, documents)를 돌려준다.
+        n_workers > 1 이면 process pool에서 파싱하며, shard 순서대로 결과를 돌려주므로 document의 원래 순서가 유지된다.
+        동시에 처리 중인 shard 수를 max_pending_shards로 제한하여, 메모리 사용량이 shard_size * max_pending_shards를 넘지 않게 한다.
+        shard의 끝 offset은 다음 item의 시작 위치이므로 checkpoint에서 재개 위치로 사용할 수 있다.
+        압축된 dump의 offset은 압축을 해제한 stream 기준이다.
+        :param start_offset: 파싱을 시작할 item의 byte offset (checkpoint에서 재개할 때 사용)
+        :return: Iterator[Tuple[int, List[Dict]]]
+        """
+        tasks: Iterator[Tuple[int, Callable, object]] = self._iter_shard_tasks(start_offset)
+        if self.n_workers <= 1:
+            for end, parse, shard in tasks:
+                yield end, parse(shard)
+            return
+
+        with Pool(processes=self.n_workers) as pool:
+            pending: deque = deque()
+            for end, parse, shard in tasks:
+                if len(pending) >= self.max_pending_shards:
+                    pending_end, result = pending.popleft()
+                    yield pending_end, result.get()
+                pending.append((end, pool.apply_async(parse, (shard,))))
+            while pending:
+                pending_end, result = pending.popleft()
+                yield pending_end, result.get()
+
+    def _iter_shard_tasks(self, start_offset: int) -> Iterator[Tuple[int, Callable, object]]:
+        """
+        (shard의 끝 offset, 파싱 함수, 파싱 함수의 인자)를 순서대로 돌려준다.
+        압축되지 않은 dump는 worker가 직접 seek 하여 읽도록 byte 구간만 넘기고,
+        압축된 dump는 seek이 불가능하므로 main process에서 순차적으로 압축을 해제한 shard를 넘긴다.
+        """
+        if get_compression(self.json_path) is None:
+            shards: List[Tuple[int, int]] = self._split_shards(start_offset)
+            sys.stdout.write(f'Split Json into {len(shards)} shards\n')
+            for start, end in shards:
+                yield end, _parse_shard, (self.json_path, start, end)
+        else:
+            for end, data in self._read_stream_shards(start_offset):
+                yield end, _parse_shard_bytes, data
+
+    def _read_stream_shards(self, start_offset: int = 0, read_size: int = 4 * 1024 * 1024) -> Iterator[Tuple[int, bytes]]:
+        """
+        압축된 dump를 순차적으로 해제하면서 shard_size를 넘은 뒤 처음 나오는 item 경계에서 자른다.
+        경계는 _split_shards와 같은 ITEM_BOUNDARY('},{"namespace":')로 찾으므로, '},{'로 끝나는 문서 텍스트 안에서 자르지 않는다.
+        :return: Iterator[Tuple[int, bytes]] (압축 해제 기준 shard의 끝 offset, shard byte열)
+        """
+        with open_dump(self.json_path) as json_file:
+            buffer = bytearray()
+            if start_offset:
+                json_file.seek(start_offset)
+                offset = start_offset
+            else:
+                buffer += json_file.read(read_size)
+                first = buffer.find(b'{')
+                if first < 0:
+                    return
+                del buffer[:first]
+                offset = first
+
+            while True:
+                match = ITEM_BOUNDARY.search(buffer, self.shard_size) if len(buffer) > self.shard_size else None
+                if match:
+                    cut = match.start(1)
+                    yield offset + cut, bytes(buffer[:cut])
+                    del buffer[:cut]
+                    offset += cut
+                    continue
+                chunk: bytes = json_file.read(read_size)
+                if not chunk:
+                    if buffer:
+                        yield offset + len(buffer), bytes(buffer)
+                    return
+                buffer += chunk
+
+    def _split_shards(self, start_offset: int = 0) -> List[Tuple[int, int]]:
+        """
+        shard_size 간격으로 seek 한 뒤, 그 다음에 나오는 item 경계에서 dump를 자른다.
+        :param start_offset: 0이 아니면 item의 시작 위치여야 한다.
+        :return: List[Tuple[int, int]] 각 shard의 [start, end) byte 구간
+        """
+        file_size: int = os.path.getsize(self.json_path)
+        if start_offset >= file_size:
+            return []
+        with open(self.json_path, 'rb') as json_file:
+            if start_offset:
+                first = start_offset
+            else:
+                head: bytes = json_file.read(4096)
+                first = head.find(b'{')
+            if first < 0:
+                return []
+            boundaries: List[int] = [first]
+            offset = first + self.shard_size
+            while offset < file_size:
+                boundary = self._find_boundary(json_file, offset)
+                if boundary < 0:
+                    break
+                if boundary > boundaries[-1]:
+                    boundaries.append(boundary)
+                offset = boundary + self.shard_size
+        boundaries.append(file_size)
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    @staticmethod
+    def _find_boundary(json_file, offset: int, window: int = 1024 * 1024) -> int:
+        """
+        offset 이후 처음 나오는 item의 시작('{') 위치를 찾는다. 없으면 -1
+        """
+        json_file.seek(offset)
+        overlap = b''
+        base = offset
+        while True:
+            chunk: bytes = json_file.read(window)
+            if not chunk:
+                return -1
+            buffer = overlap + chunk
+            match = ITEM_BOUNDARY.search(buffer)
+            if match:
+                return base + match.start(1)
+            # 경계 패턴이 chunk 사이에 걸칠 수 있으므로 끝부분을 남겨둔다.
+            overlap = buffer[-64:]
+            base += len(buffer) - len(overlap)
 
 
 def main():
+    parser = argparse.ArgumentParser(description='namuwiki dump를 text, graph로 변환')
+    parser.add_argument('--json-path', default='./data/namuwiki_20210301.json')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--checkpoint-every', type=int, default=16, help='checkpoint를 남기는 shard 간격 (0이면 끔)')
+    parser.add_argument('--resume', action='store_true', help='마지막 checkpoint에서 이어서 진행')
+    parser.add_argument('--typed-edges', action='store_true',
+                        help='상위/하위/관련 문서, 분류 link에 relation label을 붙여 relations.pkl로 저장')
+    parser.add_argument('--incremental', action='store_true',
+                        help='이전 build와 content hash를 비교하여 바뀐 문서만 다시 처리')
+    args = parser.parse_args()
+
     max_docs = 10000
     directory_path = './data/result'
-    extract_wikidata = ExtractWikiData(max_docs=max_docs, directory=directory_path, debug=False)
-    documents: List[dict] = extract_wikidata.parse_namuwiki_json()
-    transform_data = TransformData(documents)
+    file_manager = FileManager()
+    extract_wikidata = ExtractWikiData(max_docs=max_docs, directory=directory_path, debug=False,
+                                       n_workers=args.workers, json_path=args.json_path)
+    if args.incremental:
+        transform_data = TransformData(extract_wikidata, file_manager=file_manager, typed_edges=args.typed_edges)
+        graph: Dict = transform_data.update(directory=directory_path, build_state=file_manager.load_build_state())
+        file_manager.save_graph(graph)
+        file_manager.save_graph_binary(graph)
+        file_manager.save_adjacency_store(graph)
+        file_manager.save_redirect_closure(transform_data.get_resolver())
+        file_manager.save_redirect_index(transform_data.get_resolver())
+        file_manager.save_title_index(file_manager.load_index())
+        if args.typed_edges:
+            file_manager.save_relations(transform_data.relations)
+        file_manager.save_build_state(transform_data.build_state())
+        return
+
+    transform_data = TransformData(extract_wikidata, file_manager=file_manager,
+                                   checkpoint_every=args.checkpoint_every, resume=args.resume,
+                                   typed_edges=args.typed_edges)
     transform_data.to_text(directory=directory_path)
     graph: Dict = transform_data.to_graph()
-    file_manager = FileManager()
     file_manager.save_graph(graph)
+    file_manager.save_graph_binary(graph)
+    file_manager.save_adjacency_store(graph)
+    file_manager.save_redirect_closure(transform_data.get_resolver())
+    file_manager.save_redirect_index(transform_data.get_resolver())
+    file_manager.save_title_index(file_manager.load_index())
+    if args.typed_edges:
+        file_manager.save_relations(transform_data.relations)
+    file_manager.save_build_state(transform_data.build_state())
+    file_manager.remove_checkpoint()
 
 
-main()
+if __name__ == '__main__':
+    main()
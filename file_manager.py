@@ -1,4 +1,5 @@
-from typing import Dict
+from typing import Dict, Optional, Sequence
+import hashlib
 import os
 import pickle
 import json
@@ -7,6 +8,13 @@ from scipy.sparse.csr import csr_matrix
 from scipy.sparse.coo import coo_matrix
 from scipy.io import mmwrite, mmread
 
+from adjacency_store import AdjacencyStore
+from graph import CSRGraph
+from mmap_file import StringTable, write_sections, open_sections
+from query_cache import QueryCache, HashingWriter, combine_fingerprints
+from text_store import TextStore
+from title_index import TitleIndex, RedirectIndex, read_pairs
+
 
 class FileManager:
     """
@@ -17,6 +25,18 @@ class FileManager:
             dir_path = './data/result'
         self.dir_path = dir_path
         self.graph_file_name = 'graph.pkl'
+        self.graph_binary_file_name = 'graph.bin'
+        self.adjacency_file_name = 'graph.sqlite'
+        self.relations_file_name = 'relations.pkl'
+        self.checkpoint_file_name = 'checkpoint.pkl'
+        self.build_state_file_name = 'build_state.pkl'
+        self.index_file_name = 'index.txt'
+        self.title_index_file_name = 'index.bin'
+        self.redirect_file_name = 'redirect.txt'
+        self.redirect_closure_file_name = 'redirect_closure.pkl'
+        self.redirect_index_file_name = 'redirect.bin'
+        self.fingerprints_file_name = 'fingerprints.json'
+        self.query_cache_dir_name = 'query_cache'
 
         self.__init()
 
@@ -28,9 +48,174 @@ class FileManager:
             wiki_graph: Dict = self.load_query_graph(query=query)
         return wiki_graph
 
+    def load_compact_graph(self) -> CSRGraph:
+        """
+        graph.pkl을 int32 id와 CSR 배열로 된 CSRGraph로 변환하여 돌려준다. dict graph 대신 사용할 수 있다.
+        """
+        return CSRGraph.from_dict(self.load_graph())
+
+    def load_graph_binary(self) -> CSRGraph:
+        """
+        save_graph_binary로 저장한 graph.bin을 np.memmap으로 연다. pickle을 풀지 않으므로 graph 크기와 관계없이 바로 열린다.
+        """
+        return CSRGraph.open(os.path.join(self.dir_path, self.graph_binary_file_name))
+
+    def save_graph_binary(self, wiki_graph):
+        """
+        :param wiki_graph: dict graph 또는 CSRGraph
+        """
+        if not isinstance(wiki_graph, CSRGraph):
+            wiki_graph = CSRGraph.from_dict(wiki_graph)
+        wiki_graph.save(os.path.join(self.dir_path, self.graph_binary_file_name))
+        self._record_fingerprint(self.graph_binary_file_name, self._file_hash(self.graph_binary_file_name))
+
+    def load_adjacency_store(self, cache_size: int = 100000) -> AdjacencyStore:
+        """
+        node의 link를 필요할 때만 disk에서 읽는 graph. 전체 graph를 메모리에 올릴 수 없을 때 dict graph 대신 사용한다.
+        :param cache_size: LRU cache에 둘 adjacency 수
+        """
+        return AdjacencyStore(os.path.join(self.dir_path, self.adjacency_file_name), cache_size=cache_size)
+
+    def save_adjacency_store(self, wiki_graph: Dict):
+        AdjacencyStore.build(os.path.join(self.dir_path, self.adjacency_file_name), wiki_graph)
+
     def save_graph(self, wiki_graph: Dict):
         with open(os.path.join(self.dir_path, self.graph_file_name), 'wb') as f:
-            pickle.dump({word: list(links) for word, links in wiki_graph.items()}, f)
+            writer = HashingWriter(f)
+            pickle.dump({word: list(links) for word, links in wiki_graph.items()}, writer)
+        self._record_fingerprint(self.graph_file_name, writer.hexdigest())
+
+    def load_relations(self) -> Dict[str, Dict[str, str]]:
+        """
+        graph edge의 relation label {title: {link: relation}}. typed edge로 만들지 않은 graph면 빈 dict
+        """
+        relations_path = os.path.join(self.dir_path, self.relations_file_name)
+        if not os.path.exists(relations_path):
+            return {}
+        with open(relations_path, 'rb') as pkl:
+            relations: Dict = pickle.load(pkl)
+        return relations
+
+    def save_relations(self, relations: Dict[str, Dict[str, str]]):
+        with open(os.path.join(self.dir_path, self.relations_file_name), 'wb') as pkl:
+            writer = HashingWriter(pkl)
+            pickle.dump(relations, writer, protocol=pickle.HIGHEST_PROTOCOL)
+        self._record_fingerprint(self.relations_file_name, writer.hexdigest())
+
+    def load_index(self) -> Dict[str, str]:
+        return dict(read_pairs(os.path.join(self.dir_path, self.index_file_name), '\t'))
+
+    def load_title_index(self) -> TitleIndex:
+        """
+        save_title_index로 저장한 index.bin을 mmap으로 연다. index.txt를 읽어 dict를 만들지 않으므로 바로 열린다.
+        """
+        return TitleIndex.open(os.path.join(self.dir_path, self.title_index_file_name))
+
+    def save_title_index(self, index: Dict[str, str]):
+        TitleIndex.build(index).save(os.path.join(self.dir_path, self.title_index_file_name))
+
+    def load_text_store(self) -> TextStore:
+        """
+        to_text로 저장한 document 텍스트를 title로 읽을 수 있는 mmap 기반 store
+        index.bin이 있으면 title index로 사용하고, 없으면 index.txt를 읽는다.
+        """
+        if os.path.exists(os.path.join(self.dir_path, self.title_index_file_name)):
+            return TextStore(self.dir_path, self.load_title_index())
+        return TextStore(self.dir_path, self.load_index())
+
+    def save_index(self, index: Dict[str, str]):
+        with open(os.path.join(self.dir_path, self.index_file_name), 'w', encoding='utf-8') as index_file:
+            for title, location in index.items():
+                index_file.write('%s\t%s\n' % (title, location))
+
+    def load_redirect(self) -> Dict[str, str]:
+        return dict(read_pairs(os.path.join(self.dir_path, self.redirect_file_name), '\t->\t'))
+
+    def save_redirect(self, redirect: Dict[str, str]):
+        with open(os.path.join(self.dir_path, self.redirect_file_name), 'w', encoding='utf-8') as redirect_file:
+            for from_redirect, to_redirect in redirect.items():
+                redirect_file.write('%s\t->\t%s\n' % (from_redirect, to_redirect))
+
+    def load_redirect_index(self) -> RedirectIndex:
+        return RedirectIndex.open(os.path.join(self.dir_path, self.redirect_index_file_name))
+
+    def save_redirect_index(self, resolver):
+        """
+        RedirectResolver를 mmap으로 바로 열 수 있는 redirect.bin으로 저장한다. linking.Redirect는 이 파일을 가장 먼저 찾는다.
+        """
+        RedirectIndex.build(resolver).save(os.path.join(self.dir_path, self.redirect_index_file_name))
+        self._record_fingerprint(self.redirect_index_file_name, self._file_hash(self.redirect_index_file_name))
+
+    def save_redirect_closure(self, resolver):
+        """
+        RedirectResolver를 저장한다. linking.Redirect는 이 파일이 있으면 redirect를 다시 계산하지 않는다.
+        """
+        with open(os.path.join(self.dir_path, self.redirect_closure_file_name), 'wb') as pkl:
+            writer = HashingWriter(pkl)
+            pickle.dump(resolver, writer, protocol=pickle.HIGHEST_PROTOCOL)
+        self._record_fingerprint(self.redirect_closure_file_name, writer.hexdigest())
+
+    def graph_fingerprint(self) -> str:
+        """
+        query 결과에 영향을 주는 파일(graph.pkl, graph.bin, redirect closure, redirect.bin, relations)의 fingerprint.
+        save_* 때 기록한 content hash를 쓰고, 기록이 없거나 그 뒤로 파일이 바뀌었으면 크기와 수정 시각을 쓴다.
+        """
+        recorded: Dict = self._load_fingerprints()
+        fingerprints: Dict[str, str] = {}
+        for file_name in (self.graph_file_name, self.graph_binary_file_name, self.redirect_closure_file_name,
+                          self.redirect_index_file_name, self.relations_file_name):
+            path = os.path.join(self.dir_path, file_name)
+            if not os.path.exists(path):
+                continue
+            stat = os.stat(path)
+            record = recorded.get(file_name, {})
+            if record.get('size') == stat.st_size and record.get('mtime_ns') == stat.st_mtime_ns:
+                fingerprints[file_name] = record['hash']
+            else:
+                fingerprints[file_name] = '%d:%d' % (stat.st_size, stat.st_mtime_ns)
+        return combine_fingerprints(fingerprints)
+
+    def load_query_cache(self, max_bytes: int = 1024 * 1024 * 1024) -> QueryCache:
+        """
+        :param max_bytes: cache directory의 최대 byte 크기. 넘으면 오래 사용하지 않은 결과부터 지운다.
+        """
+        return QueryCache(os.path.join(self.dir_path, self.query_cache_dir_name), max_bytes=max_bytes)
+
+    def _load_fingerprints(self) -> Dict:
+        fingerprints_path = os.path.join(self.dir_path, self.fingerprints_file_name)
+        if not os.path.exists(fingerprints_path):
+            return {}
+        with open(fingerprints_path, encoding='utf-8') as json_file:
+            fingerprints: Dict = json.load(json_file)
+        return fingerprints
+
+    def _file_hash(self, file_name: str) -> str:
+        """
+        pickle처럼 쓰면서 hash 할 수 없는 binary 파일(write_sections)은 저장한 뒤 다시 읽어 hash 한다.
+        """
+        content_hash = hashlib.blake2b(digest_size=16)
+        with open(os.path.join(self.dir_path, file_name), 'rb') as binary_file:
+            for chunk in iter(lambda: binary_file.read(1024 * 1024), b''):
+                content_hash.update(chunk)
+        return content_hash.hexdigest()
+
+    def _record_fingerprint(self, file_name: str, content_hash: str):
+        fingerprints: Dict = self._load_fingerprints()
+        stat = os.stat(os.path.join(self.dir_path, file_name))
+        fingerprints[file_name] = {'hash': content_hash, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        fingerprints_path = os.path.join(self.dir_path, self.fingerprints_file_name)
+        with open(fingerprints_path + '.tmp', 'w', encoding='utf-8') as json_file:
+            json.dump(fingerprints, json_file)
+        os.replace(fingerprints_path + '.tmp', fingerprints_path)
+
+    def load_build_state(self) -> Dict:
+        with open(os.path.join(self.dir_path, self.build_state_file_name), 'rb') as pkl:
+            build_state: Dict = pickle.load(pkl)
+        return build_state
+
+    def save_build_state(self, build_state: Dict):
+        with open(os.path.join(self.dir_path, self.build_state_file_name), 'wb') as pkl:
+            pickle.dump(build_state, pkl, protocol=pickle.HIGHEST_PROTOCOL)
 
     def load_query(self, query:str) -> Dict:
         with open(os.path.join(self.dir_path, query+'.pkl'), 'rb') as pkl:
@@ -60,15 +245,65 @@ class FileManager:
             self._visualize(query_graph)
 
     def load_tfidf(self, query: str) -> csr_matrix:
+        """
+        save_tfidf로 저장한 binary CSR 파일을 np.memmap으로 연다. 배열을 그대로 csr_matrix로 감싸므로 변환이 없다.
+        """
+        sections, meta = open_sections(os.path.join(self.dir_path, query + '_tfidf.bin'))
+        if meta.get('format') != 'csr_matrix':
+            raise ValueError(f'{query}_tfidf.bin is not a csr matrix file')
+        return csr_matrix((sections['data'], sections['indices'], sections['indptr']), shape=tuple(meta['shape']),
+                          copy=False)
+
+    def load_tfidf_vocabulary(self, query: str) -> StringTable:
+        """
+        :return: StringTable column -> term (vocabulary[i]), term -> column (vocabulary.get(term))
+        """
+        sections, _ = open_sections(os.path.join(self.dir_path, query + '_tfidf.bin'))
+        return StringTable.from_sections(sections, 'vocabulary')
+
+    def save_tfidf(self, query: str, tfidf_vector: csr_matrix, vocabulary: Sequence[str] = ()):
+        """
+        TF-IDF 행렬을 CSR 배열(data, indices, indptr) 그대로 binary 파일에 저장한다. (mmap_file.write_sections)
+        :param vocabulary: column 순서의 term 목록 (TfidfVectorizer.get_feature_names_out())
+        """
+        tfidf_vector: csr_matrix = csr_matrix(tfidf_vector)
+        sections: Dict = StringTable.build(list(vocabulary)).sections('vocabulary')
+        sections.update(data=tfidf_vector.data, indices=tfidf_vector.indices, indptr=tfidf_vector.indptr)
+        write_sections(os.path.join(self.dir_path, query + '_tfidf.bin'), sections,
+                       {'format': 'csr_matrix', 'shape': list(tfidf_vector.shape)})
+
+    def load_tfidf_mtx(self, query: str) -> csr_matrix:
         mtx_path = os.path.join(self.dir_path, query+'.mtx')
         wiki_tdm: coo_matrix = mmread(mtx_path)
         wiki_tdm: csr_matrix = wiki_tdm.tocsr()
         return wiki_tdm
 
-    def save_tfidf(self, query: str, tfidf_vector: csr_matrix):
+    def save_tfidf_mtx(self, query: str, tfidf_vector: csr_matrix):
         mtx_path = os.path.join(self.dir_path, query+'.mtx')
         mmwrite(mtx_path, tfidf_vector)
 
+    def load_checkpoint(self) -> Optional[Dict]:
+        checkpoint_path = os.path.join(self.dir_path, self.checkpoint_file_name)
+        if not os.path.exists(checkpoint_path):
+            return None
+        with open(checkpoint_path, 'rb') as pkl:
+            checkpoint: Dict = pickle.load(pkl)
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint: Dict):
+        """
+        임시 파일에 쓴 뒤 교체하여, 저장 도중 프로세스가 죽어도 이전 checkpoint가 깨지지 않게 한다.
+        """
+        checkpoint_path = os.path.join(self.dir_path, self.checkpoint_file_name)
+        with open(checkpoint_path + '.tmp', 'wb') as pkl:
+            pickle.dump(checkpoint, pkl, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+    def remove_checkpoint(self):
+        checkpoint_path = os.path.join(self.dir_path, self.checkpoint_file_name)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
     @staticmethod
     def __init():
         if not os.path.exists('./data'):
@@ -0,0 +1,371 @@
+from typing import List, Dict, Iterable, Iterator, Mapping, Optional, Sequence, Tuple
+from collections.abc import Mapping as MappingABC
+import sys
+import threading
+
+import numpy as np
+
+from mmap_file import StringTable, write_sections, open_sections
+
+
+class CSRGraph(MappingABC):
+    """
+    Dict[str, Set[str]] 형태의 graph를 title vocabulary와 CSR(indptr, indices) 배열로 저장하는 compact graph.
+    title은 int32 id로 바꾸어 저장하고, edge마다 문자열 대신 4 byte id만 저장한다.
+    id [0, n_keys)는 원래 dict의 key(link가 있는 document)이고, 나머지 id는 link로만 등장하는 title이다.
+    out-adjacency(indptr, indices)와 in-adjacency(in_indptr, in_indices)를 함께 가진다.
+
+    Mapping을 구현하므로 SearchQuery, TreeToGraph, GraphModeling에서 dict graph 대신 사용할 수 있다.
+    graph[title] -> List[str], title in graph, graph.keys(), graph.items(), len(graph)
+    """
+    def __init__(self, titles: Sequence[str], vocabulary: Mapping[str, int], n_keys: int,
+                 indptr: np.ndarray, indices: np.ndarray, in_indptr: np.ndarray, in_indices: np.ndarray) -> None:
+        """
+        :param titles: id -> title
+        :param vocabulary: title -> id
+        :param n_keys: 원래 dict의 key 수
+        :param indptr: out-adjacency indptr (n_nodes + 1)
+        :param indices: out-adjacency indices (n_edges)
+        :param in_indptr: in-adjacency indptr (n_nodes + 1)
+        :param in_indices: in-adjacency indices (n_edges)
+        """
+        self.titles: Sequence[str] = titles
+        self.vocabulary: Mapping[str, int] = vocabulary
+        self.n_keys = n_keys
+        self.indptr = indptr
+        self.indices = indices
+        self.in_indptr = in_indptr
+        self.in_indices = in_indices
+        # (idf, norms). 여러 thread가 처음 similarity를 구할 때도 둘이 함께 보이도록 _tfidf_lock 안에서 한 번에 넣는다.
+        self._tfidf: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._tfidf_lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, graph: Dict, unique_links: bool = False) -> 'CSRGraph':
+        """
+        dict graph를 CSRGraph로 변환한다. vocabulary는 dict의 key 순서, 그 다음 link로 처음 등장한 순서로 id를 붙인다.
+        :param unique_links: True이면 node마다 중복된 link를 하나만 남긴다. TreeToGraph 결과처럼 link가 반복될 수 있는
+                             graph를 nx.DiGraph(중복 edge 없음)와 같은 graph로 만들 때 사용한다. (pagerank 등)
+        """
+        if unique_links:
+            graph = {title: list(dict.fromkeys(links)) for title, links in graph.items()}
+        titles: List[str] = list(graph.keys())
+        vocabulary: Dict[str, int] = {title: i for i, title in enumerate(titles)}
+        n_keys = len(titles)
+
+        degrees = np.fromiter((len(links) for links in graph.values()), dtype=np.int64, count=n_keys)
+        indices = np.empty(int(degrees.sum()), dtype=np.int32)
+        position = 0
+        for links in graph.values():
+            for link in links:
+                node_id = vocabulary.get(link)
+                if node_id is None:
+                    node_id = vocabulary[link] = len(titles)
+                    titles.append(link)
+                indices[position] = node_id
+                position += 1
+
+        n_nodes = len(titles)
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:n_keys + 1])
+        indptr[n_keys + 1:] = indptr[n_keys]
+
+        sources = np.repeat(np.arange(n_keys, dtype=np.int32), degrees)
+        in_indptr, in_indices = cls.transpose(indices, sources, n_nodes)
+        sys.stdout.write(f'CSR Graph: {n_nodes} nodes, {len(indices)} edges\n')
+        return cls(titles, vocabulary, n_keys, indptr, indices, in_indptr, in_indices)
+
+    @classmethod
+    def from_edges(cls, sources: np.ndarray, targets: np.ndarray, titles: Sequence[str],
+                   n_keys: Optional[int] = None) -> 'CSRGraph':
+        """
+        edge 배열(sources[i] -> targets[i], title id)로 한 번에 CSRGraph를 만든다.
+        :param n_keys: key(document)인 앞쪽 title 수. 없으면 모든 title을 key로 한다.
+        """
+        n_nodes = len(titles)
+        sources = np.asarray(sources, dtype=np.int32)
+        order = np.argsort(sources, kind='stable')
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n_nodes), out=indptr[1:])
+        indices = np.asarray(targets, dtype=np.int32)[order]
+        in_indptr, in_indices = cls.transpose(indices, sources[order], n_nodes)
+        titles = titles if isinstance(titles, StringTable) else list(titles)
+        vocabulary = titles if isinstance(titles, StringTable) else {title: i for i, title in enumerate(titles)}
+        return cls(titles, vocabulary, n_nodes if n_keys is None else n_keys, indptr, indices, in_indptr, in_indices)
+
+    @classmethod
+    def from_networkx(cls, G) -> 'CSRGraph':
+        """
+        networkx graph의 node를 title로 하는 CSRGraph. 모든 node를 key로 한다.
+        """
+        titles: List = list(G.nodes)
+        node_ids: Dict = {node: i for i, node in enumerate(titles)}
+        edges = np.array([(node_ids[u], node_ids[v]) for u, v in G.edges()], dtype=np.int64).reshape(-1, 2)
+        if not G.is_directed():
+            edges = np.concatenate((edges, edges[edges[:, 0] != edges[:, 1]][:, ::-1]))
+        return cls.from_edges(edges[:, 0], edges[:, 1], titles)
+
+    @classmethod
+    def from_sparse(cls, matrix, titles: Sequence[str]) -> 'CSRGraph':
+        """
+        scipy sparse 인접 행렬(matrix[i, j] != 0 이면 i -> j)로 CSRGraph를 만든다.
+        """
+        matrix = matrix.tocoo()
+        nonzero = matrix.data != 0
+        return cls.from_edges(matrix.row[nonzero], matrix.col[nonzero], titles)
+
+    def subgraph(self, node_ids: np.ndarray) -> 'CSRGraph':
+        """
+        node_ids의 induced subgraph. 새 graph의 id i는 원래 graph의 id node_ids[i]이다.
+        :param node_ids: 오름차순으로 정렬된 원래 id
+        """
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        new_ids = np.full(self.n_nodes, -1, dtype=np.int64)
+        new_ids[node_ids] = np.arange(len(node_ids))
+        sources = new_ids[np.repeat(np.arange(self.n_nodes), self.out_degree())]
+        targets = new_ids[self.indices]
+        kept = (sources >= 0) & (targets >= 0)
+        return self.from_edges(sources[kept], targets[kept], [self.titles[i] for i in node_ids.tolist()],
+                               n_keys=int(np.searchsorted(node_ids, self.n_keys)))
+
+    def prune_dead_ends(self, max_in_degree: int = 100, max_out_degree: int = 0,
+                        max_rounds: int = 0) -> Tuple[np.ndarray, List[Dict[str, int]]]:
+        """
+        out-degree <= max_out_degree 이고 in-degree <= max_in_degree 인 dead end node를 지운다.
+        node를 지우면 이웃의 degree가 줄어 새로운 dead end가 생기므로, 더 지울 node가 없을 때까지 반복한다. (k-core peeling)
+        degree는 배열로 관리하고, round마다 지운 node의 이웃만 다시 검사한다.
+        :param max_in_degree: dead end로 볼 최대 in-degree
+        :param max_out_degree: dead end로 볼 최대 out-degree
+        :param max_rounds: 최대 반복 횟수 (0이면 바뀌지 않을 때까지)
+        :return: (남은 node의 원래 id (오름차순), round별 {'round', 'removed_nodes', 'removed_edges', 'nodes', 'edges'})
+        """
+        in_degree, out_degree = self.in_degree(), self.out_degree()
+        alive = np.ones(self.n_nodes, dtype=bool)
+        removed = np.flatnonzero((out_degree <= max_out_degree) & (in_degree <= max_in_degree))
+        n_nodes, n_edges = self.n_nodes, self.n_edges
+        stats: List[Dict[str, int]] = []
+        while len(removed) and (not max_rounds or len(stats) < max_rounds):
+            # 지운 node끼리의 edge는 out-degree, in-degree 양쪽에 세어지므로 한 번 빼준다.
+            targets, _ = self.gather(removed)
+            sources, _ = self.gather(removed, reverse=True)
+            alive[removed] = False
+            n_removed_edges = int(out_degree[removed].sum() + in_degree[removed].sum()
+                                  - np.count_nonzero(np.isin(targets, removed)))
+            in_degree -= np.bincount(targets, minlength=self.n_nodes)
+            out_degree -= np.bincount(sources, minlength=self.n_nodes)
+            n_nodes, n_edges = n_nodes - len(removed), n_edges - n_removed_edges
+            stats.append({'round': len(stats) + 1, 'removed_nodes': len(removed), 'removed_edges': n_removed_edges,
+                          'nodes': n_nodes, 'edges': n_edges})
+
+            neighbors = np.unique(np.concatenate((targets, sources)))
+            neighbors = neighbors[alive[neighbors]]
+            removed = neighbors[(out_degree[neighbors] <= max_out_degree) & (in_degree[neighbors] <= max_in_degree)]
+        return np.flatnonzero(alive), stats
+
+    def to_sparse(self):
+        """
+        :return: scipy csr_matrix 인접 행렬 (n_nodes x n_nodes, edge는 1.0)
+        """
+        from scipy.sparse import csr_matrix
+        return csr_matrix((np.ones(self.n_edges), self.indices, self.indptr), shape=(self.n_nodes, self.n_nodes))
+
+    def to_networkx(self, directed: bool = True):
+        """
+        title을 node로 하는 networkx graph를 만든다. edge마다 add_edge를 부르는 대신
+        edge 배열을 title 배열로 바꾸어 add_nodes_from, add_edges_from 한 번씩으로 추가한다.
+        """
+        import networkx as nx
+        G = nx.DiGraph() if directed else nx.Graph()
+        titles = np.array(self.titles[:], dtype=object)
+        G.add_nodes_from(titles.tolist())
+        sources = np.repeat(np.arange(self.n_nodes), self.out_degree())
+        G.add_edges_from(zip(titles[sources].tolist(), titles[self.indices].tolist()))
+        return G
+
+    def save(self, path: str) -> None:
+        """
+        graph를 mmap으로 바로 열 수 있는 binary 파일로 저장한다. (mmap_file.write_sections)
+        titles는 StringTable(utf-8 blob + offset + 정렬 순서)로 저장하여 vocabulary dict 없이 title -> id를 찾는다.
+        """
+        titles = self.titles if isinstance(self.titles, StringTable) else StringTable.build(self.titles)
+        sections: Dict[str, np.ndarray] = titles.sections('titles')
+        sections.update(indptr=self.indptr, indices=self.indices, in_indptr=self.in_indptr, in_indices=self.in_indices)
+        write_sections(path, sections, {'format': 'csr_graph', 'n_keys': self.n_keys})
+
+    @classmethod
+    def open(cls, path: str) -> 'CSRGraph':
+        """
+        save로 저장한 파일을 np.memmap으로 연다. 배열을 읽어 들이지 않으므로 graph 크기와 관계없이 바로 열리고,
+        실제로 접근한 page만 disk에서 읽는다. 여러 process가 같은 파일을 열면 메모리를 공유한다.
+        """
+        sections, meta = open_sections(path)
+        if meta.get('format') != 'csr_graph':
+            raise ValueError(f'{path} is not a graph file')
+        titles = StringTable.from_sections(sections, 'titles')
+        return cls(titles, titles, meta['n_keys'], sections['indptr'], sections['indices'],
+                   sections['in_indptr'], sections['in_indices'])
+
+    @staticmethod
+    def transpose(indices: np.ndarray, sources: np.ndarray, n_nodes: int):
+        """
+        edge 목록(sources -> indices)으로부터 in-adjacency의 (indptr, indices)를 구한다.
+        """
+        order = np.argsort(indices, kind='stable')
+        in_indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=n_nodes), out=in_indptr[1:])
+        return in_indptr, sources[order].astype(np.int32, copy=False)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.indices)
+
+    def id_of(self, title: str) -> int:
+        """
+        :return: title의 id. graph에 없는 title이면 -1
+        """
+        return self.vocabulary.get(title, -1)
+
+    def title_of(self, node_id: int) -> str:
+        return self.titles[node_id]
+
+    def out_ids(self, node_id: int) -> np.ndarray:
+        return self.indices[self.indptr[node_id]:self.indptr[node_id + 1]]
+
+    def in_ids(self, node_id: int) -> np.ndarray:
+        return self.in_indices[self.in_indptr[node_id]:self.in_indptr[node_id + 1]]
+
+    def gather(self, node_ids: np.ndarray, reverse: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        여러 node의 adjacency를 python loop 없이 indptr로 index를 만들어 한 번에 가져온다.
+        :param reverse: True면 in-adjacency
+        :return: (node_ids 순서대로 이어 붙인 adjacency, node별 adjacency 길이)
+        """
+        indptr, indices = (self.in_indptr, self.in_indices) if reverse else (self.indptr, self.indices)
+        starts = indptr[node_ids]
+        lengths = indptr[node_ids + 1] - starts
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return indices[offsets + np.arange(int(lengths.sum()))], lengths
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def in_degree(self) -> np.ndarray:
+        return np.diff(self.in_indptr)
+
+    def similar(self, title: str, top: int = 10) -> List[Tuple[str, float]]:
+        """
+        :return: [(title, similarity)] similarity_scores가 높은 순 top개 (자기 자신 제외)
+        """
+        similarity = self.similarity_scores(title)
+        similarity[self.id_of(title)] = 0.0
+        candidates = np.flatnonzero(similarity)
+        order = np.argsort(-similarity[candidates], kind='stable')[:top]
+        return [(self.titles[i], float(similarity[i])) for i in candidates[order].tolist()]
+
+    def similarity_scores(self, title: str) -> np.ndarray:
+        """
+        link를 단어처럼 보고 document마다 link TF-IDF vector(idf = log(n_nodes / (1 + in_degree)))를 만들어,
+        title과의 cosine similarity를 구한다. title과 link를 공유하는 document만 in-adjacency로 모아 계산한다.
+        :return: document id [0, n_keys)로 index 하는 similarity 배열
+        """
+        node_id = self.id_of(title)
+        if not 0 <= node_id < self.n_keys:
+            raise KeyError(title)
+        idf, norms = self._link_tfidf()
+        links = self.out_ids(node_id)
+        if not len(links) or not norms[node_id]:
+            return np.zeros(self.n_keys)
+        sources, lengths = self.gather(links, reverse=True)
+        scores = np.bincount(sources, weights=np.repeat(idf[links] ** 2, lengths), minlength=self.n_keys)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = scores / (norms[:self.n_keys] * norms[node_id])
+        return np.nan_to_num(similarity, nan=0.0, posinf=0.0)
+
+    def _link_tfidf(self) -> Tuple[np.ndarray, np.ndarray]:
+        tfidf = self._tfidf
+        if tfidf is None:
+            with self._tfidf_lock:
+                if self._tfidf is None:
+                    idf = np.log(self.n_nodes / (1.0 + self.in_degree()))
+                    sources = np.repeat(np.arange(self.n_nodes), self.out_degree())
+                    norms = np.sqrt(np.bincount(sources, weights=idf[self.indices] ** 2, minlength=self.n_nodes))
+                    self._tfidf = idf, norms
+                tfidf = self._tfidf
+        return tfidf
+
+    def pagerank(self, alpha: float = 0.85, personalization: Optional[np.ndarray] = None,
+                 start: Optional[np.ndarray] = None, tol: float = 1.0e-6, max_iter: int = 100) -> np.ndarray:
+        """
+        in-adjacency를 scipy csr_matrix로 감싸 power iteration으로 PageRank를 구한다. (nx.pagerank와 같은 식)
+        x = alpha * (W^T x + (dangling node의 x 합) * p) + (1 - alpha) * p
+        out-link가 없는 dangling node의 score는 personalization 분포(p)대로 나누어 준다.
+        :param alpha: damping factor
+        :param personalization: node id별 teleport 가중치 (personalized PageRank). 없으면 uniform
+        :param start: 시작 vector. 이전에 구한 score를 주면 적은 반복으로 수렴한다. (warm start)
+        :param tol: node 수 * tol보다 L1 변화량이 작아지면 멈춘다.
+        :param max_iter: 최대 반복 횟수
+        :return: node id로 index 하는 PageRank 배열 (합 1)
+        """
+        from scipy.sparse import csr_matrix
+        n_nodes = self.n_nodes
+        if n_nodes == 0:
+            return np.zeros(0)
+        out_degree = self.out_degree().astype(np.float64)
+        dangling = np.flatnonzero(out_degree == 0)
+        inverse = np.divide(1.0, out_degree, out=np.zeros(n_nodes), where=out_degree > 0)
+        in_matrix = csr_matrix((np.ones(self.n_edges), self.in_indices, self.in_indptr), shape=(n_nodes, n_nodes))
+
+        teleport = np.full(n_nodes, 1.0 / n_nodes) if personalization is None else self._distribution(personalization)
+        x = np.full(n_nodes, 1.0 / n_nodes) if start is None else self._distribution(start)
+        for iteration in range(max_iter):
+            last = x
+            x = in_matrix @ (last * inverse)
+            x += last[dangling].sum() * teleport
+            x *= alpha
+            x += (1 - alpha) * teleport
+            if np.abs(x - last).sum() < n_nodes * tol:
+                return x
+        sys.stdout.write(f'PageRank did not converge in {max_iter} iterations\n')
+        return x
+
+    def seed_vector(self, titles: Iterable[str]) -> np.ndarray:
+        """
+        :return: titles에 같은 가중치를 준 personalization vector (graph에 없는 title은 무시)
+        """
+        seeds = np.zeros(self.n_nodes)
+        node_ids = [node_id for node_id in map(self.id_of, titles) if node_id >= 0]
+        seeds[node_ids] = 1.0
+        return seeds
+
+    @staticmethod
+    def _distribution(weights: np.ndarray) -> np.ndarray:
+        total = weights.sum()
+        if total <= 0:
+            raise ValueError('weights must have a positive sum')
+        return weights / total
+
+    def predecessors(self, title: str) -> List[str]:
+        node_id = self.id_of(title)
+        if node_id < 0:
+            return []
+        return [self.titles[i] for i in self.in_ids(node_id).tolist()]
+
+    def __getitem__(self, title: str) -> List[str]:
+        node_id = self.id_of(title)
+        if node_id < 0 or node_id >= self.n_keys:
+            raise KeyError(title)
+        return [self.titles[i] for i in self.out_ids(node_id).tolist()]
+
+    def __contains__(self, title) -> bool:
+        return 0 <= self.id_of(title) < self.n_keys
+
+    def __iter__(self) -> Iterator[str]:
+        for node_id in range(self.n_keys):
+            yield self.titles[node_id]
+
+    def __len__(self) -> int:
+        return self.n_keys
@@ -1,65 +1,129 @@
-from typing import List, Dict, Set
+from typing import List, Dict, Mapping, Tuple
 import os
 import pickle
 import json
+import sys
 
-from tqdm import tqdm
+import numpy as np
+
+from graph import CSRGraph
+from title_index import TitleIndex, RedirectIndex, read_pairs
 
 
 class Indexer:
-    def __init__(self, dir_path: str, file_name: str) -> None:
+    """
+    title -> document location('segment:offset:length') index
+    ingest 때 저장한 title index(index.bin)가 있으면 mmap으로 열어 load 없이 조회하고, 없으면 index 파일을 읽는다.
+    """
+    def __init__(self, dir_path: str, file_name: str, index_file_name: str = 'index.bin') -> None:
         self.dir_path = dir_path
-        self.indexer = self._load_indexer(file_name)
+        index_path = os.path.join(dir_path, index_file_name)
+        if os.path.exists(index_path):
+            self.indexer: Mapping[str, str] = TitleIndex.open(index_path)
+        else:
+            self.indexer: Mapping[str, str] = self._load_indexer(file_name)
 
     def _load_indexer(self, file_name) -> Dict:
-        try:
-            indexer = {}
-            with open(os.path.join(self.dir_path, file_name), encoding='utf-8') as indexer_file:
-                for line in indexer_file.readlines():
-                    line = line.split('\t')
-                    index_name = line[0]
-                    index_location = line[1].strip()
-                    indexer[index_name] = index_location
-            return indexer
-        except Exception as e:
-            print(e)
-            return {}
+        return dict(read_pairs(os.path.join(self.dir_path, file_name), '\t'))
+
+
+class RedirectResolver:
+    """
+    redirect map의 transitive closure를 한 번에 계산하여, 임의의 link를 최종 link와 거쳐간 alias로 O(1)에 바꿔주는 클래스
+    이미 계산한 link에 도달하면 그 결과를 이어 붙여(path compression) 각 redirect를 한 번씩만 따라간다.
+    redirect cycle(A -> B -> A)은 cycles에 기록하고, cycle에 속한 link는 cycle에서 가장 작은 title을 최종 link로 한다.
+    """
+    def __init__(self, redirect: Dict[str, str]) -> None:
+        self.redirect: Dict[str, str] = redirect
+        self.target: Dict[str, str] = {}
+        self.aliases: Dict[str, Tuple[str, ...]] = {}
+        self.cycles: List[List[str]] = []
+        self._resolve_all()
+
+    def __contains__(self, link: str) -> bool:
+        return link in self.target
+
+    def resolve(self, link: str) -> Tuple[str, Tuple[str, ...]]:
+        """
+        :param link: 문서 title
+        :return: (최종 link, link부터 최종 link 직전까지 거쳐간 redirect link들). redirect가 아니면 (link, ())
+        """
+        if link not in self.target:
+            return link, ()
+        return self.target[link], self.aliases[link]
+
+    def _resolve_all(self) -> None:
+        for start in self.redirect:
+            if start in self.target:
+                continue
+            path: List[str] = []
+            position: Dict[str, int] = {}
+            link = start
+            while link in self.redirect and link not in self.target and link not in position:
+                position[link] = len(path)
+                path.append(link)
+                link = self.redirect[link]
+
+            if link in position:
+                cycle_start = position[link]
+                self._resolve_cycle(path[cycle_start:])
+                path = path[:cycle_start]
+            if link in self.target:
+                target, tail = self.target[link], self.aliases[link]
+            else:
+                target, tail = link, ()
+            for i in range(len(path) - 1, -1, -1):
+                tail = (path[i],) + tail
+                self.target[path[i]] = target
+                self.aliases[path[i]] = tail
+
+        if self.cycles:
+            sys.stdout.write(f'Redirect cycles: {len(self.cycles)}\n')
+
+    def _resolve_cycle(self, cycle: List[str]) -> None:
+        self.cycles.append(cycle)
+        representative: str = min(cycle)
+        start = cycle.index(representative)
+        cycle = cycle[start:] + cycle[:start]
+        self.target[representative] = representative
+        self.aliases[representative] = ()
+        for i in range(1, len(cycle)):
+            self.target[cycle[i]] = representative
+            self.aliases[cycle[i]] = tuple(cycle[i:])
 
 
 class Redirect:
     """
     리다이렉트가 존재하면 최종 링크까지 리다이렉트 시켜 "redirect"에 저장
     리다이렉트할 때, 그 링크의 의미도 분석하기 위해 "similar"에 저장
+    ingest 때 저장한 redirect index(redirect.bin)가 있으면 mmap으로 열어 load 없이 사용하고,
+    없으면 redirect closure(redirect_closure.pkl), 그것도 없으면 redirect 파일로부터 계산한다.
     """
-    def __init__(self, dir_path: str, file_name: str) -> None:
-        self.redirect = self._load_redirect(dir_path, file_name)
+    def __init__(self, dir_path: str, file_name: str, closure_file_name: str = 'redirect_closure.pkl',
+                 index_file_name: str = 'redirect.bin') -> None:
+        index_path = os.path.join(dir_path, index_file_name)
+        closure_path = os.path.join(dir_path, closure_file_name)
+        if os.path.exists(index_path):
+            self.resolver: RedirectIndex = RedirectIndex.open(index_path)
+            self.redirect: Mapping[str, str] = self.resolver
+        elif os.path.exists(closure_path):
+            with open(closure_path, 'rb') as pkl:
+                self.resolver: RedirectResolver = pickle.load(pkl)
+            self.redirect = self.resolver.redirect
+        else:
+            self.redirect = self._load_redirect(dir_path, file_name)
+            self.resolver = RedirectResolver(self.redirect)
 
     def __getitem__(self, key: str) -> Dict:
         return self._redirect(key)
 
     def _load_redirect(self, dir_path, file_name) -> Dict:
-        redirect: Dict = {}
-        try:
-            with open(os.path.join(dir_path, file_name), encoding='utf-8') as redirect_file:
-                for line in redirect_file.readlines():
-                    line = line.split('\t->\t')
-                    if len(line) == 2:
-                        from_redirect = line[0]
-                        to_redirect = line[1]
-                        redirect[from_redirect] = to_redirect
-        except Exception as e:
-            print(e)
-            return {}
-        return redirect
+        return dict(read_pairs(os.path.join(dir_path, file_name), '\t->\t'))
 
     def _redirect(self, link: str) -> Dict:
         query_result: Dict = {}
-        redirect_links: Set = set()
-
-        while link in self.redirect:
-            redirect_links.add(link)
-            link = self.redirect[link]
-        query_result["similar"] = redirect_links
+        link, redirect_links = self.resolver.resolve(link)
+        query_result["similar"] = set(redirect_links)
         query_result["redirect"] = link
 
         return query_result
@@ -69,32 +133,77 @@ class TreeToGraph:
     """
     Query에 대해 파싱한 QueryTree에서 연결 가능한 노드들을 connected 시키는 클래스
     """
-    def __init__(self, graph: Dict, query: str) -> None:
+    def __init__(self, graph: Dict, query: str, query_tree: Dict = None) -> None:
+        """
+        :param query_tree: SearchQuery.bfs_search_query 결과. 없으면 저장된 ./data/result/{query}.pkl을 읽는다.
+        """
         self.graph: Dict = graph
         self.query = query
-        self.query_tree: Dict = self._load_query()
+        if query_tree is None:
+            self.query_tree: Dict = self._load_query()
+        else:
+            self.query_tree: Dict = {node: list(edges) for node, edges in query_tree.items()}
 
-    def _connect(self, node1: str, node2: str):
+    def tree_to_graph(self):
         """
-        전체 그래프에 node1->node2가 연결되어 있다면, query에서 node1-> node2로 연결하는 함수
-        :param node1: 문서1
-        :param node2: 문서2
-        :return:
+        전체 그래프에 node1->node2가 연결되어 있다면, query에서 node1-> node2로 연결한다. (query_keys의 induced subgraph)
+        모든 (node1, node2) 쌍을 확인하는 대신, node1의 link 중 query_keys에 있는 것을 position map으로 찾으므로
+        작업량은 query_keys의 link 수에 비례한다. node1의 list에는 query_keys 순서대로 추가된다.
         """
-        if node1 in self.graph:
-            if node2 in self.graph[node1]:
+        query_keys: List = list(self.query_tree[self.query])
+        positions: Dict[str, List[int]] = {}
+        for position, node in enumerate(query_keys):
+            positions.setdefault(node, []).append(position)
+
+        if isinstance(self.graph, CSRGraph) and all(len(found) == 1 for found in positions.values()):
+            induced_links = self._induced_links_csr(query_keys)
+        else:
+            induced_links = self._induced_links(query_keys, positions)
+        for node1, links in zip(query_keys, induced_links):
+            if links:
                 if node1 not in self.query_tree:
                     self.query_tree[node1] = []
-                self.query_tree[node1].append(node2)
-
-    def tree_to_graph(self):
-        query_keys: List = list(self.query_tree[self.query])
-        for node1 in tqdm(query_keys):
-            for node2 in query_keys:
-                if node1 != node2:
-                    self._connect(node1, node2)
+                self.query_tree[node1].extend(links)
         return self.query_tree
 
+    def _induced_links(self, query_keys: List[str], positions: Dict[str, List[int]]) -> List[List[str]]:
+        """
+        :return: query_keys[i]의 link 중 query_keys에 있는 node (자기 자신 제외, query_keys 순서)
+        """
+        induced_links: List[List[str]] = []
+        for node1 in query_keys:
+            if node1 not in self.graph:
+                induced_links.append([])
+                continue
+            matched: List[int] = sorted(position for link in set(self.graph[node1]) if link != node1
+                                        for position in positions.get(link, ()))
+            induced_links.append([query_keys[position] for position in matched])
+        return induced_links
+
+    def _induced_links_csr(self, query_keys: List[str]) -> List[List[str]]:
+        """
+        CSRGraph용 _induced_links. query_keys의 link를 한 번에 모으고, 정렬한 query_keys id에서 searchsorted로 찾는다.
+        """
+        graph: CSRGraph = self.graph
+        n_query_keys = len(query_keys)
+        ids = np.fromiter((graph.id_of(node) for node in query_keys), dtype=np.int64, count=n_query_keys)
+        order = np.argsort(ids)
+        sorted_ids = ids[order]
+        sources = np.flatnonzero((ids >= 0) & (ids < graph.n_keys))
+        links, lengths = graph.gather(ids[sources])
+        sources = np.repeat(sources, lengths)
+
+        found = np.minimum(np.searchsorted(sorted_ids, links), max(n_query_keys - 1, 0))
+        is_key = sorted_ids[found] == links if n_query_keys else np.zeros(len(links), dtype=bool)
+        sources, matched = sources[is_key], order[found[is_key]]
+        # (source, matched) 쌍을 source, matched 순서로 정렬하고 중복 link를 없앤다.
+        pairs = np.unique(sources[sources != matched] * n_query_keys + matched[sources != matched])
+        sources, matched = np.divmod(pairs, n_query_keys) if n_query_keys else (pairs, pairs)
+
+        matched_titles: List[str] = [query_keys[i] for i in matched.tolist()]
+        bounds: List[int] = np.searchsorted(sources, np.arange(n_query_keys + 1)).tolist()
+        return [matched_titles[bounds[i]:bounds[i + 1]] for i in range(n_query_keys)]
+
     def _load_query(self) -> Dict:
         with open(f'./data/result/{self.query}.pkl', 'rb') as pkl:
             query_tree = pickle.load(pkl)
@@ -0,0 +1,157 @@
+from typing import List, Dict, Tuple, Sequence, Optional
+from bisect import bisect_right
+import json
+import os
+import struct
+
+import numpy as np
+
+
+MAGIC = b'NAMUMMAP'
+ALIGNMENT = 64
+VERSION = 1
+SAMPLE_INTERVAL = 64
+
+
+def write_sections(path: str, sections: Dict[str, np.ndarray], meta: Dict) -> None:
+    """
+    여러 numpy 배열을 하나의 binary 파일로 저장한다.
+    [MAGIC(8)][header 길이(8)][header json][section 0][section 1]..
+    header에는 meta와 각 section의 dtype, shape, offset이 들어가며, section은 ALIGNMENT byte 단위로 정렬한다.
+    임시 파일에 쓴 뒤 교체하므로, 읽고 있는 process가 있어도 기존 파일은 깨지지 않는다.
+    """
+    layout: Dict[str, Dict] = {}
+    offset = 0
+    for name, array in sections.items():
+        array = np.ascontiguousarray(array)
+        sections[name] = array
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += _aligned(array.nbytes)
+    header: bytes = json.dumps({'version': VERSION, 'meta': meta, 'sections': layout}).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    with open(path + '.tmp', 'wb') as binary_file:
+        binary_file.write(MAGIC)
+        binary_file.write(struct.pack('<Q', len(header)))
+        binary_file.write(header)
+        for name, array in sections.items():
+            binary_file.seek(data_start + layout[name]['offset'])
+            binary_file.write(array.tobytes())
+        binary_file.truncate(data_start + offset)
+    os.replace(path + '.tmp', path)
+
+
+def open_sections(path: str) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """
+    write_sections로 저장한 파일을 np.memmap으로 열어 section 배열들을 복사 없이 돌려준다.
+    배열은 read-only이며 같은 파일을 연 process들은 page cache를 공유한다.
+    :return: (section 이름 -> 배열, meta)
+    """
+    with open(path, 'rb') as binary_file:
+        magic = binary_file.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a {MAGIC.decode()} file')
+        header_length, = struct.unpack('<Q', binary_file.read(8))
+        header: Dict = json.loads(binary_file.read(header_length).decode('utf-8'))
+    if header['version'] != VERSION:
+        raise ValueError(f'{path}: unsupported version {header["version"]}')
+
+    data_start = _aligned(len(MAGIC) + 8 + header_length)
+    # np.memmap subclass는 slicing마다 overhead가 있으므로, 같은 mapping을 가리키는 일반 ndarray로 바꾸어 사용한다.
+    buffer = np.asarray(np.memmap(path, dtype=np.uint8, mode='r'))
+    sections: Dict[str, np.ndarray] = {}
+    for name, layout in header['sections'].items():
+        dtype = np.dtype(layout['dtype'])
+        count = int(np.prod(layout['shape'], dtype=np.int64))
+        start = data_start + layout['offset']
+        sections[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(layout['shape'])
+    return sections, header['meta']
+
+
+def typed_view(array: np.ndarray, typecode: str) -> memoryview:
+    """
+    numpy 배열과 같은 buffer를 가리키는 1차원 memoryview. numpy scalar indexing보다 조회가 빠르다.
+    원소가 없는 배열(shape에 0이 있는 배열)은 memoryview로 cast 할 수 없으므로 빈 memoryview를 돌려준다.
+    :param typecode: struct typecode ('q': int64, 'i': int32, 'B': uint8)
+    """
+    array = np.ascontiguousarray(array)
+    if array.size == 0:
+        return memoryview(b'').cast(typecode)
+    view = memoryview(array.reshape(-1)).cast('B')
+    return view if typecode == 'B' else view.cast(typecode)
+
+
+def _aligned(size: int) -> int:
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class StringTable(Sequence):
+    """
+    문자열 목록을 utf-8 blob과 offset 배열로 저장한 table. table[i] -> str
+    order(문자열 byte 순으로 정렬한 id)로 binary search 하여 table.get(string) -> id 를 dict 없이 O(log n)에 찾는다.
+    처음 get 할 때 정렬 순서로 SAMPLE_INTERVAL개마다 하나씩 문자열을 메모리에 올려 두고, 그 안에서 먼저 bisect 한다.
+    write_sections/open_sections로 저장하면 loading 없이 mmap으로 바로 사용할 수 있다.
+    """
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray, order: np.ndarray) -> None:
+        self.offsets = offsets
+        self.blob = blob
+        self.order = order
+        # numpy scalar indexing은 느리므로, 조회에는 같은 buffer를 가리키는 memoryview를 사용한다.
+        self._offsets = typed_view(offsets, 'q')
+        self._blob = typed_view(blob, 'B')
+        self._order = typed_view(order, 'i')
+        self._samples: Optional[List[bytes]] = None
+
+    @classmethod
+    def build(cls, strings: Sequence[str]) -> 'StringTable':
+        encoded: List[bytes] = [string.encode('utf-8') for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        order = np.array(sorted(range(len(encoded)), key=encoded.__getitem__), dtype=np.int32)
+        return cls(offsets, blob, order)
+
+    def sections(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {prefix + '_offsets': self.offsets, prefix + '_blob': self.blob, prefix + '_order': self.order}
+
+    @classmethod
+    def from_sections(cls, sections: Dict[str, np.ndarray], prefix: str) -> 'StringTable':
+        return cls(sections[prefix + '_offsets'], sections[prefix + '_blob'], sections[prefix + '_order'])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i) -> str:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._bytes(int(i)).decode('utf-8')
+
+    def get(self, string: str, default=None):
+        """
+        :return: string의 id. 없으면 default
+        """
+        key: bytes = string.encode('utf-8')
+        order = self._order
+        if self._samples is None:
+            self._samples = [self._bytes(order[i]) for i in range(0, len(order), SAMPLE_INTERVAL)]
+        block = bisect_right(self._samples, key) - 1
+        if block < 0:
+            return default
+        low, high = block * SAMPLE_INTERVAL, min((block + 1) * SAMPLE_INTERVAL, len(order))
+        while low < high:
+            middle = (low + high) // 2
+            if self._bytes(order[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(order):
+            node_id = order[low]
+            if self._bytes(node_id) == key:
+                return node_id
+        return default
+
+    def __contains__(self, string) -> bool:
+        return self.get(string) is not None
+
+    def _bytes(self, i: int) -> bytes:
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes()
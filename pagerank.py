@@ -1,11 +1,12 @@
 import sys
 from operator import itemgetter
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import mpld3
 from pyvis.network import Network
 import plotly.express as px
 import pandas as pd
+import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
 from sklearn.manifold import TSNE
@@ -15,10 +16,10 @@ from matplotlib import (font_manager,
                         matplotlib_fname,
                         get_cachedir,
                         use)
-from tqdm import tqdm
 
 from eda import EDA, NetworkAnalysis
 from file_manager import FileManager
+from graph import CSRGraph
 
 # if platform.system() == 'Windows':
 use('Agg')
@@ -37,61 +38,101 @@ print(plt.rcParams['font.family'])
 
 
 class GraphModeling:
-    def __init__(self) -> None:
+    """
+    dict graph를 분석용 graph로 만드는 클래스.
+    networkx graph는 edge마다 add_edge를 부르지 않고 add_nodes_from, add_edges_from 한 번씩으로 만든다.
+    use_networkx가 False면 networkx graph를 만들지 않고 CSRGraph를 돌려준다. networkx graph 생성은 edge마다 dict를
+    만들어야 해서 느리고 메모리를 많이 쓰므로, degree(EDA), PageRank(pagerank)만 필요할 때 사용한다.
+    """
+    def __init__(self, use_networkx: bool = True) -> None:
+        """
+        :param use_networkx: False면 graph_modeling이 networkx graph 대신 CSRGraph를 돌려준다.
+        """
+        self.use_networkx = use_networkx
+        # pruning_edges 후 남은 node의 pruning 전 id (CSRGraph id, networkx graph면 G.nodes 순서)
+        self.kept_ids: Optional[np.ndarray] = None
 
-    def graph_modeling(self, graph: Dict, direction=True) -> nx.DiGraph:
+    def graph_modeling(self, graph: Dict, direction=True):
+        """
+        :param graph: dict graph 또는 CSRGraph
+        :param direction: False면 nx.Graph (use_networkx일 때만)
+        :return: nx.DiGraph, nx.Graph 또는 CSRGraph
+        """
         sys.stdout.write('<< Convert Dict to Graph >>\n')
-        if direction:
-            G = nx.DiGraph()
-            G.add_nodes_from(graph.keys())
-            for idx, (node, edges) in enumerate(tqdm(graph.items())):
-                for edge in edges:
-                    G.add_edge(node, edge)
+        if not self.use_networkx:
+            G = graph if isinstance(graph, CSRGraph) else CSRGraph.from_dict(graph)
+            n_nodes, n_edges = G.n_nodes, G.n_edges
+        elif isinstance(graph, CSRGraph):
+            G = graph.to_networkx(directed=direction)
+            n_nodes, n_edges = len(G.nodes), len(G.edges)
         else:
-            G = nx.Graph()
-            for node, edges in tqdm(graph.items()):
-                for edge in edges:
-                    G.add_edge(node, edge)
+            G = nx.DiGraph() if direction else nx.Graph()
+            G.add_nodes_from(graph.keys())
+            G.add_edges_from((node, edge) for node, edges in graph.items() for edge in edges)
+            n_nodes, n_edges = len(G.nodes), len(G.edges)
 
         # Total Numbers of Documents, Nodes, Edges
-        sys.stdout.write(f'Total Documents: {len(graph.items())} \n')
-        sys.stdout.write(f'Total Nodes: {len(G.nodes)} \n')
-        sys.stdout.write(f'Total Edges: {len(G.edges)} \n')
+        sys.stdout.write(f'Total Documents: {len(graph)} \n')
+        sys.stdout.write(f'Total Nodes: {n_nodes} \n')
+        sys.stdout.write(f'Total Edges: {n_edges} \n')
         return G
 
-
-    def pruning_edges(self, G: nx.DiGraph) -> nx.DiGraph:
+    def pruning_edges(self, G, max_in_degree: int = 100, max_out_degree: int = 0, max_rounds: int = 0):
         """
-        pruning dead_ends node if node in-degree <= 100 and node out-degree == 0
-        :param G:
-        :return: G: nx.Digraph
+        pruning dead_ends node if node in-degree <= max_in_degree and node out-degree <= max_out_degree
+        dead end를 지우면 새로 생기는 dead end도 없어질 때까지 반복해서 지운다. (CSRGraph.prune_dead_ends)
+        :param G: nx.DiGraph 또는 CSRGraph
+        :param max_rounds: 최대 반복 횟수 (0이면 바뀌지 않을 때까지)
+        :return: G: nx.DiGraph면 dead end node를 지운 G, CSRGraph면 남은 node의 subgraph
+                 (subgraph id i의 원래 id는 self.kept_ids[i])
         """
-        # [TODO] pruning 어떤 기준으로 할지 생각하기
-
-        degrees = [n for n in G.nodes() if G.out_degree(n) == 0 and G.in_degree(n) <= 100]
-        n_pruning_edges = sum([G.degree(node) for node in degrees])
-        n_dead_node = len(degrees)
-        sys.stdout.write(f'Dead Nodes: {n_dead_node}\n')
-        sys.stdout.write(f'Pruning Edges: {n_pruning_edges}\n\n')
-        G.remove_nodes_from(degrees)
-        sys.stdout.write(f'Current Nodes: {G.number_of_nodes()}\n')
-        sys.stdout.write(f'Current Edges: {G.number_of_edges()} \n')
-        sys.stdout.write(f'Average Degree: {G.number_of_edges()/G.number_of_nodes()}\n')
+        csr_graph: CSRGraph = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+        self.kept_ids, stats = csr_graph.prune_dead_ends(max_in_degree=max_in_degree, max_out_degree=max_out_degree,
+                                                         max_rounds=max_rounds)
+        for round_stats in stats:
+            sys.stdout.write(f'Round {round_stats["round"]}: Dead Nodes: {round_stats["removed_nodes"]}, '
+                             f'Pruning Edges: {round_stats["removed_edges"]}\n')
+        sys.stdout.write(f'Dead Nodes: {sum(round_stats["removed_nodes"] for round_stats in stats)}\n')
+        sys.stdout.write(f'Pruning Edges: {sum(round_stats["removed_edges"] for round_stats in stats)}\n\n')
+
+        if isinstance(G, CSRGraph):
+            G = csr_graph.subgraph(self.kept_ids)
+            n_nodes, n_edges = G.n_nodes, G.n_edges
+        else:
+            alive = np.zeros(csr_graph.n_nodes, dtype=bool)
+            alive[self.kept_ids] = True
+            G.remove_nodes_from([csr_graph.titles[i] for i in np.flatnonzero(~alive).tolist()])
+            n_nodes, n_edges = G.number_of_nodes(), G.number_of_edges()
+        sys.stdout.write(f'Current Nodes: {n_nodes}\n')
+        sys.stdout.write(f'Current Edges: {n_edges} \n')
+        sys.stdout.write(f'Average Degree: {n_edges / n_nodes if n_nodes else 0}\n')
         return G
 
 
-def network_analysis(G: nx.DiGraph):
+def network_analysis(G):
     sys.stdout.write('-- Start network analysis--\n')
     eda = EDA(G)
     eda.plot_node_degree()
+    if isinstance(G, CSRGraph):
+        # clustering coefficient, centrality는 networkx graph가 필요하다. (GraphModeling(use_networkx=True))
+        return
 
     network_eda = NetworkAnalysis(G)
     network_eda.clustering_coefficient()
     network_eda.network_centrality()
 
 
-def pagerank(G):
-    pr_graph: Dict = nx.pagerank(G)
+def pagerank(graph) -> Dict[str, float]:
+    """
+    CSRGraph.pagerank(scipy sparse power iteration)로 PageRank를 구한다. nx.pagerank와 같은 결과를 돌려준다.
+    :param graph: dict graph, CSRGraph 또는 networkx graph
+    :return: {title: pagerank}
+    """
+    if isinstance(graph, nx.Graph):
+        graph = nx.to_dict_of_lists(graph)
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph, unique_links=True)
+    pr_graph: Dict[str, float] = dict(zip(graph.titles, graph.pagerank().tolist()))
     pr_score: List = sorted(pr_graph.items(), key=itemgetter(1), reverse=True)
     sys.stdout.write(f'pagerank: {pr_score[:100]}')
     return pr_graph
@@ -148,8 +189,9 @@ def main():
     file_manager = FileManager()
     sys.stdout.write('<< Unpicking done .. >>\n\n')
     graph: Dict = file_manager.load_graph(query=query)
-    G = graph_modeling(graph)
-    # G = pruning_edges(G)
+    graph_modeling = GraphModeling()
+    G = graph_modeling.graph_modeling(graph)
+    # G = graph_modeling.pruning_edges(G)
     # network_analysis(G)
     # pr_graph = pagerank(G)
     # test(G)
@@ -157,4 +199,5 @@ def main():
     # pyvis_test(G)
 
 
-main()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import sys
+import heapq
+import argparse
+from typing import List, Dict, Tuple, Set, Optional, Iterable
+
+from file_manager import FileManager
+from graph import CSRGraph
+from linking import Redirect
+
+
+class PathQuery:
+    """
+    두 문서가 link로 어떻게 이어지는지 찾는 클래스.
+    양쪽 끝에서 동시에 BFS를 하여(bidirectional BFS) 가운데에서 만나므로, 한쪽에서만 펼칠 때보다 훨씬 적은 node만 방문한다.
+    k개의 최단 경로는 Yen's algorithm으로 구한다.
+    graph가 CSRGraph이면 node id와 in-adjacency를 그대로 사용하고, dict graph면 처음 사용할 때 역방향 adjacency를 만든다.
+    """
+    def __init__(self, graph: Dict, redirect: Redirect = None) -> None:
+        """
+        :param graph: Dict 또는 CSRGraph
+        :param redirect: Redirect 시작, 끝 문서의 redirect를 따라갈 때 사용한다. 없으면 새로 읽는다.
+        """
+        if redirect is None:
+            redirect = Redirect(dir_path='./data/result/', file_name='redirect.txt')
+        self.redirect: Redirect = redirect
+        self.graph = graph
+        self._reverse: Optional[Dict[str, List[str]]] = None
+
+    def shortest_path(self, source: str, target: str) -> List[str]:
+        """
+        :return: source에서 target까지 link를 따라가는 최단 경로 (title 목록). 없으면 빈 list
+        """
+        paths = self.k_shortest_paths(source, target, k=1)
+        return paths[0] if paths else []
+
+    def k_shortest_paths(self, source: str, target: str, k: int = 3) -> List[List[str]]:
+        """
+        Yen's algorithm: 이전 경로의 각 node에서 갈라지는(spur) 경로를, 앞서 찾은 경로의 edge를 막고 다시 찾는다.
+        :return: 길이 순으로 최대 k개의 경로 (같은 node를 두 번 지나지 않는다)
+        """
+        source, target = self._resolve(source), self._resolve(target)
+        source_node, target_node = self._node(source), self._node(target)
+        if source_node is None or target_node is None:
+            return []
+
+        first = self._bidirectional_bfs(source_node, target_node, set(), set())
+        if first is None:
+            return []
+        paths: List[List] = [first]
+        candidates: List[Tuple[int, List]] = []
+        seen: Set[Tuple] = {tuple(first)}
+        while len(paths) < k:
+            previous = paths[-1]
+            for i in range(len(previous) - 1):
+                root = previous[:i + 1]
+                removed_edges: Set[Tuple] = {(path[i], path[i + 1]) for path in paths
+                                             if len(path) > i + 1 and path[:i + 1] == root}
+                spur = self._bidirectional_bfs(previous[i], target_node, set(root[:-1]), removed_edges)
+                if spur is None:
+                    continue
+                candidate = root[:-1] + spur
+                if tuple(candidate) not in seen:
+                    seen.add(tuple(candidate))
+                    heapq.heappush(candidates, (len(candidate), candidate))
+            if not candidates:
+                break
+            paths.append(heapq.heappop(candidates)[1])
+        return [self._titles(path) for path in paths]
+
+    def _bidirectional_bfs(self, source, target, removed_nodes: Set, removed_edges: Set[Tuple]) -> Optional[List]:
+        """
+        source에서 out-link, target에서 in-link를 따라 한 depth씩 번갈아 펼친다.
+        펼칠 link가 적은 쪽을 먼저 펼쳐서 hub 문서가 있는 쪽의 폭발을 피한다.
+        한 depth를 다 펼친 뒤 만난 node 중 경로가 가장 짧은 것을 고른다.
+        :param removed_nodes: 지나갈 수 없는 node
+        :param removed_edges: 지나갈 수 없는 (node1, node2) edge
+        :return: node 목록. 경로가 없으면 None
+        """
+        if source in removed_nodes or target in removed_nodes:
+            return None
+        if source == target:
+            return [source]
+        forward: Dict = {source: None}
+        backward: Dict = {target: None}
+        forward_depth: Dict = {source: 0}
+        backward_depth: Dict = {target: 0}
+        forward_frontier: List = [source]
+        backward_frontier: List = [target]
+        while forward_frontier and backward_frontier:
+            is_forward = self._frontier_cost(forward_frontier, True) <= self._frontier_cost(backward_frontier, False)
+            if is_forward:
+                frontier, parents, depths, others = forward_frontier, forward, forward_depth, backward_depth
+            else:
+                frontier, parents, depths, others = backward_frontier, backward, backward_depth, forward_depth
+
+            next_frontier: List = []
+            best: Optional[Tuple[int, object]] = None
+            for node in frontier:
+                for neighbor in self._neighbors(node, is_forward):
+                    edge = (node, neighbor) if is_forward else (neighbor, node)
+                    if neighbor in parents or neighbor in removed_nodes or edge in removed_edges:
+                        continue
+                    parents[neighbor] = node
+                    depths[neighbor] = depths[node] + 1
+                    next_frontier.append(neighbor)
+                    if neighbor in others:
+                        length = depths[neighbor] + others[neighbor]
+                        if best is None or length < best[0]:
+                            best = (length, neighbor)
+            if best is not None:
+                return self._join(best[1], forward, backward)
+            if is_forward:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+        return None
+
+    @staticmethod
+    def _join(meet, forward: Dict, backward: Dict) -> List:
+        path: List = []
+        node = meet
+        while node is not None:
+            path.append(node)
+            node = forward[node]
+        path.reverse()
+        node = backward[meet]
+        while node is not None:
+            path.append(node)
+            node = backward[node]
+        return path
+
+    def _frontier_cost(self, frontier: List, is_forward: bool) -> int:
+        if isinstance(self.graph, CSRGraph):
+            indptr = self.graph.indptr if is_forward else self.graph.in_indptr
+            return int((indptr[[node + 1 for node in frontier]] - indptr[frontier]).sum())
+        return len(frontier)
+
+    def _neighbors(self, node, is_forward: bool) -> Iterable:
+        if isinstance(self.graph, CSRGraph):
+            return (self.graph.out_ids(node) if is_forward else self.graph.in_ids(node)).tolist()
+        if is_forward:
+            return self.graph.get(node, ())
+        return self._reverse_graph().get(node, ())
+
+    def _reverse_graph(self) -> Dict[str, List[str]]:
+        if self._reverse is None:
+            self._reverse = {}
+            for node, links in self.graph.items():
+                for link in links:
+                    self._reverse.setdefault(link, []).append(node)
+        return self._reverse
+
+    def _resolve(self, title: str) -> str:
+        if title in self.graph:
+            return title
+        return self.redirect[title]["redirect"]
+
+    def _node(self, title: str):
+        """
+        :return: graph의 node (CSRGraph면 id, dict graph면 title). graph에 없으면 None
+        """
+        if isinstance(self.graph, CSRGraph):
+            node_id = self.graph.id_of(title)
+            return node_id if node_id >= 0 else None
+        if title in self.graph or title in self._reverse_graph():
+            return title
+        return None
+
+    def _titles(self, path: List) -> List[str]:
+        if isinstance(self.graph, CSRGraph):
+            return [self.graph.titles[node] for node in path]
+        return list(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='두 문서를 잇는 최단 link 경로를 찾는다.')
+    parser.add_argument('source')
+    parser.add_argument('target')
+    parser.add_argument('--k', type=int, default=3, help='찾을 경로 수')
+    args = parser.parse_args()
+
+    file_manager = FileManager()
+    path_query = PathQuery(file_manager.load_graph_binary())
+    for path in path_query.k_shortest_paths(args.source, args.target, k=args.k):
+        sys.stdout.write(f'{len(path) - 1}: {" -> ".join(path)}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+from typing import List, Dict, Optional, Tuple, Any
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+import threading
+
+
+# evict는 전체 크기를 max_bytes의 이 비율까지 줄여, 가득 찬 cache에서 put 할 때마다 directory를 다시 훑지 않게 한다.
+EVICT_RATIO = 0.9
+
+
+class QueryCache:
+    """
+    query 결과(query tree, query graph)를 (query, max_depth, 옵션, graph fingerprint)로 찾는 disk cache.
+    entry 파일 이름은 key의 hash이므로 graph가 바뀌면 fingerprint가 달라져 예전 결과는 더 이상 조회되지 않는다.
+    entry 파일의 mtime을 마지막 사용 시각으로 쓰고, 전체 크기가 max_bytes를 넘으면 오래 사용하지 않은 entry부터 지운다.
+    전체 크기는 처음 put 할 때 한 번 directory를 훑어 구한 뒤 put 마다 더해 가며, 이 값이 max_bytes를 넘을 때만 다시 훑어
+    max_bytes * EVICT_RATIO 까지 지운다.
+    같은 key를 여러 thread, process가 동시에 put 해도 되도록 entry는 writer마다 다른 임시 파일에 쓴 뒤 교체한다.
+    """
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024) -> None:
+        """
+        :param directory: cache entry를 저장할 directory path
+        :param max_bytes: cache directory의 최대 byte 크기
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(query: str, max_depth: int, fingerprint: str, **options) -> str:
+        """
+        :param options: 결과에 영향을 주는 SearchQuery 옵션 (relation_types 등)
+        :return: entry key (hex)
+        """
+        options = {name: sorted(value) if isinstance(value, (set, frozenset)) else value
+                   for name, value in options.items()}
+        data = json.dumps([query, max_depth, fingerprint, options], ensure_ascii=False, sort_keys=True)
+        return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+    def get(self, query: str, max_depth: int, fingerprint: str, **options) -> Optional[Any]:
+        path = self._path(self.key(query, max_depth, fingerprint, **options))
+        try:
+            with open(path, 'rb') as pkl:
+                result = pickle.load(pkl)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # 읽은 뒤 다른 thread, process가 evict 한 경우
+            pass
+        self.hits += 1
+        return result
+
+    def put(self, query: str, max_depth: int, fingerprint: str, result: Any, **options) -> None:
+        key: str = self.key(query, max_depth, fingerprint, **options)
+        path = self._path(key)
+        fd, temp_path = tempfile.mkstemp(prefix=key + '.', suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as pkl:
+                pickle.dump(result, pkl, protocol=pickle.HIGHEST_PROTOCOL)
+                size = pkl.tell()
+            with self._lock:
+                try:
+                    previous_size = os.stat(path).st_size
+                except FileNotFoundError:
+                    previous_size = 0
+                os.replace(temp_path, path)
+                if self._size is not None:
+                    self._size += size - previous_size
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if self._size is None or self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> List[str]:
+        """
+        directory를 훑어 전체 크기가 max_bytes를 넘으면 max_bytes * EVICT_RATIO 이하가 될 때까지
+        마지막 사용 시각이 오래된 entry부터 지운다.
+        다른 process가 추가하거나 지운 entry도 반영되도록 put에서 더해 온 전체 크기를 이 값으로 다시 맞춘다.
+        :return: 지운 entry key
+        """
+        with self._lock:
+            entries: List[Tuple[float, int, str]] = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.pkl'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+            evicted: List[str] = []
+            limit = self.max_bytes * EVICT_RATIO if total > self.max_bytes else self.max_bytes
+            for _, size, path in sorted(entries):
+                if total <= limit:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    # 다른 process가 먼저 지운 경우
+                    pass
+                total -= size
+                evicted.append(os.path.basename(path)[:-len('.pkl')])
+            self._size = total
+        if evicted:
+            sys.stdout.write(f'Query cache: evicted {len(evicted)} entries\n')
+        return evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.pkl'):
+                    os.remove(entry.path)
+            self._size = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.pkl')
+
+
+class HashingWriter:
+    """
+    파일에 쓰는 내용을 blake2b로 함께 hash 하는 writer. pickle.dump(obj, HashingWriter(file))
+    저장한 파일을 다시 읽지 않고 content fingerprint를 구할 때 사용한다.
+    """
+    def __init__(self, file) -> None:
+        self.file = file
+        self.hash = hashlib.blake2b(digest_size=16)
+
+    def write(self, data) -> int:
+        self.hash.update(data)
+        return self.file.write(data)
+
+    def hexdigest(self) -> str:
+        return self.hash.hexdigest()
+
+
+def combine_fingerprints(fingerprints: Dict[str, str]) -> str:
+    data = json.dumps(fingerprints, sort_keys=True)
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
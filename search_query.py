@@ -1,10 +1,17 @@
 import sys
 import pickle
 import json
-from typing import List, Dict, Tuple, Set
+import heapq
+import argparse
+from multiprocessing import Pool
+from typing import List, Dict, Tuple, Set, Optional
+
+import numpy as np
 
 from file_manager import FileManager
+from graph import CSRGraph
 from linking import Redirect, TreeToGraph
+from transform import LINK
 
 
 class SearchQuery:
@@ -12,54 +19,174 @@ class SearchQuery:
     Query Node가 주어지면 Query와 연결된 Edge들을 지정한 Depth 만큼 찾아주는 클래스.
     이때 Query Node는 Document를 의미하고, Edge는 Document에 속한 Term을 의미한다.
     """
-    def __init__(self, graph: Dict, max_depth=1) -> None:
+    def __init__(self, graph: Dict, max_depth=1, relations: Dict = None, relation_types: Set[str] = None,
+                 redirect: Redirect = None, top_k: int = 0, node_budget: int = 0, scores=None) -> None:
         """
 
         :param graph: Dict Document와 Term들이 연결되어 있는 딕셔너리 형태의 그래프
         :param max_depth: int Query가 주어졌을 때, 얼마나 깊게 트리를 생성할 것인지
+        :param relations: Dict graph edge의 relation label {title: {link: relation}}
+        :param relation_types: Set 주어지면 이 relation('parent', 'child', 'related', 'category', 'link')의 edge만 따라간다.
+        :param redirect: Redirect 여러 query에서 같은 redirect table을 쓸 때 넘긴다. 없으면 새로 읽는다.
+        :param top_k: int 0이 아니면 node마다 score가 높은 top_k개의 edge만 남긴다.
+        :param node_budget: int 0이 아니면 query tree에 들어가는 node 수를 node_budget개로 제한한다.
+            frontier는 score가 높은 node부터 펼치므로 budget은 중요한 node에 먼저 쓰인다.
+        :param scores: node 중요도. {title: score} 또는 CSRGraph node id로 index 하는 배열 (PageRank, in-degree, 유사도 등)
         """
-        self.redirect: Redirect = Redirect(dir_path='./data/result/', file_name='redirect.txt')
+        if redirect is None:
+            redirect = Redirect(dir_path='./data/result/', file_name='redirect.txt')
+        self.redirect: Redirect = redirect
         self.graph: Dict = graph
         self.max_depth: int = max_depth
+        self.relations: Dict = relations if relations is not None else {}
+        self.relation_types: Set = relation_types
+        self.top_k: int = top_k
+        self.node_budget: int = node_budget
+        self.scores = scores
         self.nodes: Set = set()
+        self.included: Set = set()
         self.number_of_depth_node: List = [0 for _ in range(self.max_depth+1)]
 
     def bfs_search_query(self, query: str) -> Dict:
         """
         BFS 기반 level-order 수행을 통해 Query(root node)에 속한 node를 구하는 함수
-        큐에 시작 노드를 넣고 BFS를 수행하며, 쿼리와 연결된 문서들을 연결한다.
+        depth 별 frontier를 한 번에 펼치며(level-synchronous), 이미 펼친 node와 frontier에 넣은 node는 다시 넣지 않는다.
+        graph가 CSRGraph이면 다음 frontier를 id 배열에서 numpy로 구한다.
         최종적으로, Document 이름을 Key로 갖고, Document에 포함된 단어들을[List] Value로 구성된 Dictionary 생성
         => {Document 이름: [단어1, 단어2, ..]}
         :return: 쿼리에 대한 연관된 단어들을 딕셔너리 기반 트리 리턴
         """
+        self.number_of_depth_node[0] = 1
+        if isinstance(self.graph, CSRGraph) and not self.relation_types and not self._is_pruned():
+            query_tree = self._bfs_csr(query)
+        else:
+            query_tree = self._bfs(query)
+        self._print_depth_node()
+        return query_tree
 
-        depth: int = 0
-        queue: List[Tuple[str, int]] = [(query, depth)]
+    def _bfs(self, query: str) -> Dict:
         query_tree: Dict = {}
-        self.number_of_depth_node[0] = 1
-        while queue:
-            all_edges: Set = set()
-            node, cur_depth = queue.pop(0)
-
-            # redirect 있는지 확인
-            if node not in self.graph:
-                redirect = self.redirect[node]
-                node = redirect["redirect"]
-                similar_node = redirect["similar"]
-                all_edges.update(similar_node)
-                self.nodes.update(similar_node)
-
-            if node in self.graph:
-                edges = self.graph[node]
+        self.nodes.add(query)
+        self.included.add(query)
+        frontier: List[str] = [query]
+        for depth in range(self.max_depth):
+            next_frontier: List[str] = []
+            if self.node_budget:
+                frontier.sort(key=self._score, reverse=True)
+            for node in frontier:
+                node, all_edges = self._resolve(node)
+                if node not in self.graph or node in query_tree:
+                    continue
+                self.included.add(node)
+                self.included.update(all_edges)
+                edges = self._filter_relations(node, self.graph[node])
+                if self._is_pruned():
+                    edges = self._prune(edges)
                 all_edges.update(edges)
                 query_tree[node] = list(all_edges)
-                for edge in edges:
-                    if edge not in self.nodes and cur_depth+1 < self.max_depth:
-                        queue.append((edge, cur_depth+1))
-                self.number_of_depth_node[cur_depth+1] += len(all_edges)
-        self._print_depth_node()
+                self.number_of_depth_node[depth+1] += len(all_edges)
+                if depth+1 < self.max_depth:
+                    for edge in edges:
+                        if edge not in self.nodes:
+                            self.nodes.add(edge)
+                            next_frontier.append(edge)
+            frontier = next_frontier
+        return query_tree
+
+    def _bfs_csr(self, query: str) -> Dict:
+        """
+        CSRGraph용 BFS. 방문 여부를 node id의 bool 배열로 관리하고, frontier의 adjacency를 한 번에 모아
+        처음 등장한 순서대로 아직 방문하지 않은 id만 다음 frontier로 넘긴다. 결과는 _bfs와 같다.
+        """
+        graph: CSRGraph = self.graph
+        titles = graph.titles
+        seen = np.zeros(graph.n_nodes, dtype=bool)
+        expanded = np.zeros(graph.n_keys, dtype=bool)
+        query_tree: Dict = {}
+        query_id = graph.id_of(query)
+        if query_id >= 0:
+            seen[query_id] = True
+        frontier: List = [query_id if query_id >= 0 else query]
+        for depth in range(self.max_depth):
+            expanded_ids: List[int] = []
+            for node in frontier:
+                all_edges: Set = set()
+                if not isinstance(node, str) and node < graph.n_keys:
+                    node_id = node
+                else:
+                    title, all_edges = self._resolve(node if isinstance(node, str) else titles[node])
+                    seen[[i for i in map(graph.id_of, all_edges) if i >= 0]] = True
+                    node_id = graph.id_of(title)
+                    if not 0 <= node_id < graph.n_keys:
+                        continue
+                if expanded[node_id]:
+                    continue
+                expanded[node_id] = True
+                expanded_ids.append(node_id)
+                edges: List[str] = list(map(titles.__getitem__, graph.out_ids(node_id).tolist()))
+                all_edges.update(edges)
+                query_tree[titles[node_id]] = list(all_edges)
+                self.number_of_depth_node[depth+1] += len(all_edges)
+
+            if depth+1 >= self.max_depth or not expanded_ids:
+                break
+            neighbors, _ = graph.gather(np.array(expanded_ids, dtype=np.int64))
+            unique_ids, first = np.unique(neighbors, return_index=True)
+            next_ids = neighbors[np.sort(first[~seen[unique_ids]])]
+            seen[next_ids] = True
+            frontier = next_ids.tolist()
         return query_tree
 
+    def _is_pruned(self) -> bool:
+        return bool(self.top_k or self.node_budget)
+
+    def _prune(self, edges) -> List[str]:
+        """
+        score가 높은 top_k개의 edge만 남기고, node_budget을 넘는 새 node는 버린다. (이미 query tree에 있는 node는 남긴다)
+        """
+        if self.top_k and len(edges) > self.top_k:
+            edges = heapq.nlargest(self.top_k, edges, key=self._score)
+        if not self.node_budget:
+            return list(edges)
+        # 남은 budget은 score가 높은 edge부터 쓴다.
+        edges = sorted(edges, key=self._score, reverse=True)
+        kept: List[str] = []
+        for edge in edges:
+            if edge in self.included:
+                kept.append(edge)
+            elif len(self.included) < self.node_budget:
+                self.included.add(edge)
+                kept.append(edge)
+        return kept
+
+    def _score(self, node: str) -> float:
+        if self.scores is None:
+            return 0.0
+        if isinstance(self.scores, dict):
+            return self.scores.get(node, 0.0)
+        node_id = self.graph.id_of(node)
+        return float(self.scores[node_id]) if 0 <= node_id < len(self.scores) else 0.0
+
+    def _resolve(self, node: str) -> Tuple[str, Set]:
+        """
+        graph에 없는 node면 redirect를 따라가고, 거쳐간 redirect link를 함께 돌려준다.
+        :return: (node, redirect link 집합)
+        """
+        all_edges: Set = set()
+        if node not in self.graph:
+            redirect = self.redirect[node]
+            node = redirect["redirect"]
+            similar_node = redirect["similar"]
+            all_edges.update(similar_node)
+            self.nodes.update(similar_node)
+        return node, all_edges
+
+    def _filter_relations(self, node: str, edges):
+        if not self.relation_types:
+            return edges
+        labels: Dict = self.relations.get(node, {})
+        return [edge for edge in edges if labels.get(edge, LINK) in self.relation_types]
+
     def _print_depth_node(self):
         for depth, num in enumerate(self.number_of_depth_node):
             sys.stdout.write(f'depth: {str(depth)} in nodes {str(num)}\n')
@@ -68,16 +195,192 @@ class SearchQuery:
         sys.stdout.write(f'total nodes: {str(sum(self.number_of_depth_node))}\n')
 
 
+SCORES = ('degree', 'pagerank', 'personalized_pagerank', 'similarity')
+# query마다 다시 계산해야 하는 score
+QUERY_SCORES = ('personalized_pagerank', 'similarity')
+
+
+def node_scores(graph: CSRGraph, score: str, query: str = None) -> np.ndarray:
+    """
+    top_k, node_budget으로 neighbor를 고를 때 쓰는 node 중요도
+    :param score: 'degree' (in-degree), 'pagerank', 'personalized_pagerank' (query와 query의 link에서 teleport 하는
+                  PageRank), 'similarity' (query와의 link TF-IDF cosine similarity)
+    :param query: score가 QUERY_SCORES일 때 기준 문서
+    :return: CSRGraph node id로 index 하는 배열
+    """
+    if score == 'degree':
+        return graph.in_degree()
+    if score == 'similarity':
+        scores = np.zeros(graph.n_nodes)
+        scores[:graph.n_keys] = graph.similarity_scores(query)
+        return scores
+    if score == 'pagerank':
+        return graph.pagerank()
+    if score == 'personalized_pagerank':
+        return graph.pagerank(personalization=graph.seed_vector([query] + graph[query]))
+    raise ValueError(f'unknown score: {score}')
+
+
+# batch worker process마다 한 번 여는 graph, redirect (_init_worker)
+_worker_state: Dict = {}
+
+
+def _init_worker(dir_path: str, max_depth: int, relation_types: Set[str] = None, top_k: int = 0,
+                 node_budget: int = 0, score: str = 'degree'):
+    file_manager = FileManager(dir_path)
+    _worker_state['graph'] = file_manager.load_graph_binary()
+    _worker_state['redirect'] = Redirect(dir_path=dir_path, file_name=file_manager.redirect_file_name)
+    _worker_state['relations'] = file_manager.load_relations() if relation_types else {}
+    _worker_state['max_depth'] = max_depth
+    _worker_state['relation_types'] = relation_types
+    _worker_state['top_k'] = top_k
+    _worker_state['node_budget'] = node_budget
+    _worker_state['score'] = score
+    # query와 관계없는 score는 worker마다 한 번만 계산한다.
+    if (top_k or node_budget) and score not in QUERY_SCORES:
+        _worker_state['scores'] = node_scores(_worker_state['graph'], score)
+
+
+def _query_scores(query: str) -> Optional[np.ndarray]:
+    if not (_worker_state['top_k'] or _worker_state['node_budget']):
+        return None
+    if _worker_state['score'] not in QUERY_SCORES:
+        return _worker_state['scores']
+    graph: CSRGraph = _worker_state['graph']
+    root: str = query if query in graph else _worker_state['redirect'][query]['redirect']
+    return node_scores(graph, _worker_state['score'], root) if root in graph else None
+
+
+def _run_query(query: str) -> Tuple[str, Dict, Dict]:
+    search_query = SearchQuery(graph=_worker_state['graph'], max_depth=_worker_state['max_depth'],
+                               relations=_worker_state['relations'], relation_types=_worker_state['relation_types'],
+                               redirect=_worker_state['redirect'], top_k=_worker_state['top_k'],
+                               node_budget=_worker_state['node_budget'], scores=_query_scores(query))
+    query_tree: Dict = search_query.bfs_search_query(query)
+    # redirect 된 query는 최종 문서가 root. query tree의 첫 key가 root 이다.
+    root: str = next(iter(query_tree), None)
+    if root is None:
+        return query, query_tree, {}
+    query_graph: Dict = TreeToGraph(_worker_state['graph'], root, query_tree=query_tree).tree_to_graph()
+    return query, query_tree, query_graph
+
+
+def batch_search_query(queries: List[str], file_manager: FileManager, output_path: str, max_depth: int = 1,
+                       n_workers: int = 1, relation_types: Set[str] = None, top_k: int = 0, node_budget: int = 0,
+                       score: str = 'degree') -> int:
+    """
+    여러 query의 query tree와 query graph를 process pool에서 구하고, 끝나는 대로 output_path에 json line으로 쓴다.
+    worker는 graph.bin을 mmap으로 열어 같은 graph를 메모리 복사 없이 공유한다.
+    query cache에 있는 결과는 다시 계산하지 않는다.
+    :param queries: query 목록
+    :param output_path: {"query", "query_tree", "query_graph"} json line을 쓸 파일
+    :param n_workers: worker process 수 (1이면 현재 process에서 실행)
+    :param top_k: SearchQuery top_k
+    :param node_budget: SearchQuery node_budget
+    :param score: top_k, node_budget에 쓸 node_scores 종류
+    :return: 처리한 query 수
+    """
+    query_cache = file_manager.load_query_cache()
+    fingerprint: str = file_manager.graph_fingerprint()
+    options: Dict = pruning_options(top_k, node_budget, score)
+    if relation_types:
+        options['relation_types'] = relation_types
+
+    def write(output_file, query: str, query_tree: Dict, query_graph: Dict):
+        output_file.write(json.dumps({'query': query, 'query_tree': query_tree, 'query_graph': query_graph},
+                                     ensure_ascii=False) + '\n')
+
+    n_done = 0
+    pending: List[str] = []
+    with open(output_path, 'w', encoding='utf-8') as output_file:
+        for query in dict.fromkeys(queries):
+            cached = query_cache.get(query, max_depth, fingerprint, **options)
+            if cached is None:
+                pending.append(query)
+            else:
+                write(output_file, query, *cached)
+                n_done += 1
+        sys.stdout.write(f'Queries: {n_done + len(pending)}, cached: {n_done}\n')
+
+        init_args = (file_manager.dir_path, max_depth, relation_types, top_k, node_budget, score)
+        if n_workers > 1:
+            pool = Pool(processes=n_workers, initializer=_init_worker, initargs=init_args)
+            results = pool.imap_unordered(_run_query, pending, chunksize=max(1, min(64, len(pending) // (n_workers * 8))))
+        else:
+            pool = None
+            _init_worker(*init_args)
+            results = map(_run_query, pending)
+        try:
+            for query, query_tree, query_graph in results:
+                write(output_file, query, query_tree, query_graph)
+                query_cache.put(query, max_depth, fingerprint, (query_tree, query_graph), **options)
+                n_done += 1
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    sys.stdout.write(f'Saved {n_done} queries to {output_path}\n')
+    return n_done
+
+
+def pruning_options(top_k: int, node_budget: int, score: str) -> Dict:
+    """
+    :return: query cache key에 더할 pruning 옵션 (pruning 하지 않으면 빈 dict)
+    """
+    if not (top_k or node_budget):
+        return {}
+    return {'top_k': top_k, 'node_budget': node_budget, 'score': score}
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Query와 연결된 문서를 depth 만큼 찾는다.')
+    parser.add_argument('--query', default='I.O.I')
+    parser.add_argument('--queries', help='query 목록 파일 (한 줄에 하나). 주어지면 --workers 개의 process로 한 번에 처리')
+    parser.add_argument('--output', default='./data/result/queries.jsonl', help='batch 결과 json lines 파일')
+    parser.add_argument('--max-depth', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--top-k', type=int, default=0, help='node마다 score가 높은 top-k개의 link만 펼친다 (0이면 전부)')
+    parser.add_argument('--node-budget', type=int, default=0, help='query tree의 최대 node 수 (0이면 제한 없음)')
+    parser.add_argument('--score', choices=SCORES, default='degree', help='--top-k, --node-budget에 쓸 node 중요도')
+    args = parser.parse_args()
+
     file_manager = FileManager()
-    wiki_graph: Dict = file_manager.load_graph()
-    query: str = 'I.O.I'
-    search_query = SearchQuery(graph=wiki_graph, max_depth=1)
+    max_depth: int = args.max_depth
+    if args.queries:
+        with open(args.queries, encoding='utf-8') as query_file:
+            queries: List[str] = [line.rstrip('\n') for line in query_file if line.strip()]
+        batch_search_query(queries, file_manager, args.output, max_depth=max_depth, n_workers=args.workers,
+                           top_k=args.top_k, node_budget=args.node_budget, score=args.score)
+        return
+
+    query: str = args.query
+    query_cache = file_manager.load_query_cache()
+    fingerprint: str = file_manager.graph_fingerprint()
+    options: Dict = pruning_options(args.top_k, args.node_budget, args.score)
+    cached = query_cache.get(query, max_depth, fingerprint, **options)
+    if cached is not None:
+        sys.stdout.write(f'Query cache hit: {query}\n')
+        query_tree, query_graph = cached
+        file_manager.save_query(query, query_tree, visualize=True)
+        file_manager.save_query_graph(query, query_graph, visualize=True)
+        return
+
+    if options:
+        _init_worker(file_manager.dir_path, max_depth, top_k=args.top_k, node_budget=args.node_budget,
+                     score=args.score)
+        wiki_graph = _worker_state['graph']
+        search_query = SearchQuery(graph=wiki_graph, max_depth=max_depth, redirect=_worker_state['redirect'],
+                                   top_k=args.top_k, node_budget=args.node_budget, scores=_query_scores(query))
+    else:
+        wiki_graph: CSRGraph = file_manager.load_graph_binary()
+        search_query = SearchQuery(graph=wiki_graph, max_depth=max_depth)
     query_tree = search_query.bfs_search_query(query)
     file_manager.save_query(query, query_tree, visualize=True)
     tree_to_graph = TreeToGraph(wiki_graph, query)
     query_graph = tree_to_graph.tree_to_graph()
     file_manager.save_query_graph(query, query_graph, visualize=True)
+    query_cache.put(query, max_depth, fingerprint, (query_tree, query_graph), **options)
 
 
-main()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+"""
+graph, redirect table, index를 한 번만 읽어 두고 localhost HTTP로 query를 받는 상주 service
+python service.py [--port 8000]
+
+GET /neighborhood?query=I.O.I&depth=1   query tree와 query graph (SearchQuery, TreeToGraph)
+    &top_k=10&node_budget=500&score=pagerank    score(degree, pagerank, personalized_pagerank, similarity)가 높은
+                                                link만 펼친다
+GET /path?source=A&target=B&k=3          두 문서를 잇는 최단 link 경로 (PathQuery)
+GET /pagerank?top=20                     전체 graph PageRank 상위 문서
+GET /pagerank?query=I.O.I&top=20         query graph의 PageRank 상위 문서
+GET /pagerank?query=I.O.I&personalized=1 query의 neighborhood에서 teleport 하는 전체 graph personalized PageRank
+GET /similarity?query=I.O.I&top=10       link TF-IDF cosine similarity가 높은 문서 (CSRGraph.similar)
+GET /document?query=I.O.I                document 텍스트 (TextStore)
+GET /metrics                             endpoint별 요청 수, 오류 수, latency
+"""
+from typing import List, Dict, Tuple, Callable, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from urllib.parse import urlsplit, parse_qs
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+
+from file_manager import FileManager
+from graph import CSRGraph
+from linking import Redirect, TreeToGraph
+from path_query import PathQuery
+from search_query import SearchQuery, node_scores, pruning_options, QUERY_SCORES
+
+
+class LatencyMetrics:
+    """
+    endpoint별 요청 수, 오류 수와 최근 max_samples개 요청의 latency 분포
+    """
+    def __init__(self, max_samples: int = 10000) -> None:
+        self.max_samples = max_samples
+        self.samples: Dict[str, deque] = {}
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, status: int):
+        with self.lock:
+            self.samples.setdefault(endpoint, deque(maxlen=self.max_samples)).append(seconds)
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            if status >= 400:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            summary: Dict[str, Dict[str, float]] = {}
+            for endpoint, samples in self.samples.items():
+                latency = np.array(samples) * 1000
+                summary[endpoint] = {
+                    'count': self.counts[endpoint],
+                    'errors': self.errors.get(endpoint, 0),
+                    'mean_ms': float(latency.mean()),
+                    'p50_ms': float(np.percentile(latency, 50)),
+                    'p95_ms': float(np.percentile(latency, 95)),
+                    'p99_ms': float(np.percentile(latency, 99)),
+                    'max_ms': float(latency.max()),
+                }
+        return summary
+
+
+class QueryService:
+    """
+    graph(graph.bin, mmap), redirect, index를 처음 한 번만 읽고 요청마다 재사용하는 HTTP service.
+    요청은 asyncio로 받고, 계산은 thread pool에서 실행하여 긴 query가 다른 요청의 수신을 막지 않는다.
+    """
+    def __init__(self, file_manager: FileManager, n_threads: int = 4) -> None:
+        """
+        :param file_manager: 결과 directory의 FileManager
+        :param n_threads: query를 계산할 thread 수
+        """
+        start = time.perf_counter()
+        self.file_manager = file_manager
+        self.graph: CSRGraph = file_manager.load_graph_binary()
+        self.redirect = Redirect(dir_path=file_manager.dir_path, file_name=file_manager.redirect_file_name)
+        self.text_store = file_manager.load_text_store()
+        self.path_query = PathQuery(self.graph, redirect=self.redirect)
+        self.query_cache = file_manager.load_query_cache()
+        self.fingerprint: str = file_manager.graph_fingerprint()
+        self.metrics = LatencyMetrics()
+        self.executor = ThreadPoolExecutor(max_workers=n_threads)
+        self._pagerank: Optional[np.ndarray] = None
+        self._pagerank_lock = threading.Lock()
+        self._in_degree: Optional[np.ndarray] = None
+        self.endpoints: Dict[str, Callable[[Dict[str, str]], Dict]] = {
+            '/neighborhood': self.neighborhood,
+            '/path': self.path,
+            '/pagerank': self.pagerank,
+            '/similarity': self.similarity,
+            '/document': self.document,
+            '/metrics': self.get_metrics,
+        }
+        sys.stdout.write(f'Loaded {len(self.graph)} documents in {time.perf_counter() - start:.2f}s\n')
+
+    def neighborhood(self, params: Dict[str, str]) -> Dict:
+        query: str = required(params, 'query')
+        max_depth = int_parameter(params, 'depth', 1)
+        top_k, node_budget = int_parameter(params, 'top_k', 0), int_parameter(params, 'node_budget', 0)
+        score: str = params.get('score', 'degree')
+        options: Dict = pruning_options(top_k, node_budget, score)
+        cached = self.query_cache.get(query, max_depth, self.fingerprint, **options)
+        if cached is None:
+            scores = self._scores(query, score) if options else None
+            query_tree: Dict = SearchQuery(self.graph, max_depth=max_depth, redirect=self.redirect, top_k=top_k,
+                                           node_budget=node_budget, scores=scores).bfs_search_query(query)
+            root: str = next(iter(query_tree), None)
+            query_graph: Dict = {} if root is None else \
+                TreeToGraph(self.graph, root, query_tree=query_tree).tree_to_graph()
+            self.query_cache.put(query, max_depth, self.fingerprint, (query_tree, query_graph), **options)
+        else:
+            query_tree, query_graph = cached
+        return {'query': query, 'depth': max_depth, 'query_tree': query_tree, 'query_graph': query_graph}
+
+    def path(self, params: Dict[str, str]) -> Dict:
+        source, target = required(params, 'source'), required(params, 'target')
+        paths: List[List[str]] = self.path_query.k_shortest_paths(source, target, k=int_parameter(params, 'k', 3))
+        return {'source': source, 'target': target, 'paths': paths}
+
+    def pagerank(self, params: Dict[str, str]) -> Dict:
+        top = int_parameter(params, 'top', 20)
+        if 'query' in params and params.get('personalized') in ('1', 'true'):
+            # node_scores('personalized_pagerank')처럼 query tree의 node와 그 link에서 teleport 한다.
+            query_tree: Dict = self.neighborhood(params)['query_tree']
+            seeds: List[str] = [link for node in query_tree if node in self.graph for link in [node] + self.graph[node]]
+            pagerank: np.ndarray = self.graph.pagerank(personalization=self.graph.seed_vector(seeds),
+                                                       start=self._pagerank)
+        elif 'query' in params:
+            query_graph: Dict = self.neighborhood(params)['query_graph']
+            return {'pagerank': self._query_pagerank(query_graph)[:top]}
+        else:
+            pagerank = self._global_pagerank()
+        order = np.argsort(-pagerank, kind='stable')[:top]
+        return {'pagerank': [(self.graph.titles[i], float(pagerank[i])) for i in order.tolist()]}
+
+    def similarity(self, params: Dict[str, str]) -> Dict:
+        query: str = required(params, 'query')
+        if query not in self.graph:
+            query = self.redirect[query]['redirect']
+        return {'query': query, 'similar': self.graph.similar(query, top=int_parameter(params, 'top', 10))}
+
+    def document(self, params: Dict[str, str]) -> Dict:
+        query: str = required(params, 'query')
+        if query not in self.text_store:
+            query = self.redirect[query]['redirect']
+        return {'query': query, 'text': self.text_store[query]}
+
+    def get_metrics(self, params: Dict[str, str]) -> Dict:
+        return self.metrics.summary()
+
+    @staticmethod
+    def _query_pagerank(query_graph: Dict) -> List[Tuple[str, float]]:
+        graph = CSRGraph.from_dict(query_graph, unique_links=True)
+        return sorted(zip(graph.titles, graph.pagerank().tolist()), key=itemgetter(1), reverse=True)
+
+    def _global_pagerank(self) -> np.ndarray:
+        """
+        전체 graph PageRank는 처음 요청될 때 한 번만 계산한다.
+        """
+        with self._pagerank_lock:
+            if self._pagerank is None:
+                self._pagerank = node_scores(self.graph, 'pagerank')
+        return self._pagerank
+
+    def _scores(self, query: str, score: str) -> np.ndarray:
+        if score == 'pagerank':
+            return self._global_pagerank()
+        if score == 'degree':
+            if self._in_degree is None:
+                self._in_degree = node_scores(self.graph, 'degree')
+            return self._in_degree
+        if score in QUERY_SCORES:
+            return node_scores(self.graph, score, query if query in self.graph else self.redirect[query]['redirect'])
+        raise ValueError(f'unknown score: {score}')
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        start = time.perf_counter()
+        path = ''
+        try:
+            request_line: bytes = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts: List[str] = request_line.decode('latin-1').split()
+            if len(parts) != 3:
+                status, body = 400, {'error': 'malformed request'}
+            else:
+                method, target, _ = parts
+                url = urlsplit(target)
+                path = url.path
+                params: Dict[str, str] = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                status, body = await self._dispatch(method, path, params)
+            data: bytes = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json; charset=utf-8\r\n'
+                         b'Content-Length: %d\r\nConnection: close\r\n\r\n'
+                         % (status, STATUS_REASONS.get(status, 'OK').encode(), len(data)) + data)
+            await writer.drain()
+            self.metrics.record(path if path in self.endpoints else 'other', time.perf_counter() - start, status)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, params: Dict[str, str]) -> Tuple[int, Dict]:
+        if path not in self.endpoints:
+            return 404, {'error': f'unknown endpoint {path}', 'endpoints': list(self.endpoints)}
+        if method != 'GET':
+            return 405, {'error': f'{method} not allowed'}
+        loop = asyncio.get_running_loop()
+        try:
+            return 200, await loop.run_in_executor(self.executor, self.endpoints[path], params)
+        except KeyError as e:
+            return 404, {'error': f'not found: {e.args[0] if e.args else ""}'}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            sys.stdout.write(f'{path} {params}: {e!r}\n')
+            return 500, {'error': repr(e)}
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8000):
+        server = await asyncio.start_server(self.handle, host, port)
+        sys.stdout.write(f'Serving on http://{host}:{port}\n')
+        async with server:
+            await server.serve_forever()
+
+
+def required(params: Dict[str, str], name: str) -> str:
+    if name not in params:
+        raise ValueError(f'missing parameter: {name}')
+    return params[name]
+
+
+# 정수 parameter의 최대값. 요청 하나가 상주하는 service의 메모리와 thread를 오래 잡지 않도록 제한한다.
+MAX_PARAMETERS: Dict[str, int] = {'depth': 10, 'k': 100, 'top': 10000, 'top_k': 10000, 'node_budget': 1000000}
+
+
+def int_parameter(params: Dict[str, str], name: str, default: int) -> int:
+    value = int(params.get(name, default))
+    if not 0 <= value <= MAX_PARAMETERS[name]:
+        raise ValueError(f'{name} must be between 0 and {MAX_PARAMETERS[name]}: {value}')
+    return value
+
+
+STATUS_REASONS: Dict[int, str] = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                                  500: 'Internal Server Error'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Semantic Network Analysis in Namuwiki query service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--dir-path', default='./data/result')
+    args = parser.parse_args()
+
+    service = QueryService(FileManager(args.dir_path), n_threads=args.threads)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
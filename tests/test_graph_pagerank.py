@@ -0,0 +1,59 @@
+import os
+import sys
+from typing import Dict, List
+
+import networkx as nx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph import CSRGraph
+
+
+# 다는 link가 없는 key, 라와 마는 key가 아닌 link(dangling node), 가 -> 나는 중복 edge, 바는 self loop
+GRAPH: Dict[str, List[str]] = {
+    '가': ['나', '나', '다', '라'],
+    '나': ['가', '마', '마'],
+    '다': [],
+    '바': ['바', '가', '라'],
+    '사': ['바', '나', '다', '다'],
+}
+
+
+def nx_graph() -> nx.DiGraph:
+    graph = nx.DiGraph()
+    graph.add_nodes_from(GRAPH)
+    graph.add_edges_from((title, link) for title, links in GRAPH.items() for link in links)
+    return graph
+
+
+def by_title(graph: CSRGraph, scores: np.ndarray) -> Dict[str, float]:
+    return {graph.titles[node_id]: float(score) for node_id, score in enumerate(scores)}
+
+
+def assert_close(actual: Dict[str, float], expected: Dict[str, float]):
+    assert actual.keys() == expected.keys()
+    for title, score in expected.items():
+        assert abs(actual[title] - score) < 1e-6, title
+
+
+def test_pagerank_matches_networkx():
+    graph = CSRGraph.from_dict(GRAPH, unique_links=True)
+    expected = nx.pagerank(nx_graph(), alpha=0.85, tol=1e-10)
+    assert_close(by_title(graph, graph.pagerank(tol=1e-10)), expected)
+
+
+def test_personalized_pagerank_matches_networkx():
+    graph = CSRGraph.from_dict(GRAPH, unique_links=True)
+    seeds = ['가'] + GRAPH['가']
+    expected = nx.pagerank(nx_graph(), alpha=0.85, tol=1e-10,
+                           personalization={title: 1.0 for title in seeds})
+    actual = graph.pagerank(personalization=graph.seed_vector(seeds), tol=1e-10)
+    assert_close(by_title(graph, actual), expected)
+
+
+def test_duplicate_links_change_pagerank():
+    unique = CSRGraph.from_dict(GRAPH, unique_links=True)
+    repeated = CSRGraph.from_dict(GRAPH)
+    assert unique.n_edges < repeated.n_edges
+    assert not np.allclose(unique.pagerank(tol=1e-10), repeated.pagerank(tol=1e-10))
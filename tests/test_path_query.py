@@ -0,0 +1,68 @@
+import os
+import sys
+from itertools import islice
+from typing import Dict, List
+
+import networkx as nx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph import CSRGraph
+from linking import Redirect
+from path_query import PathQuery
+
+
+# 가에서 마까지 길이가 다른 여러 경로가 있고, 바는 마에서 갈 수 없으며, 사는 어디로도 이어지지 않는다.
+GRAPH: Dict[str, List[str]] = {
+    '가': ['나', '다', '라'],
+    '나': ['다', '마'],
+    '다': ['라', '가'],
+    '라': ['마', '나'],
+    '마': ['가'],
+    '바': ['가'],
+    '사': [],
+}
+
+
+@pytest.fixture(params=['dict', 'csr'])
+def path_query(request, tmp_path) -> PathQuery:
+    with open(tmp_path / 'redirect.txt', 'w', encoding='utf-8') as redirect_file:
+        redirect_file.write('마별칭\t->\t마\n')
+    graph = GRAPH if request.param == 'dict' else CSRGraph.from_dict(GRAPH)
+    return PathQuery(graph, redirect=Redirect(dir_path=str(tmp_path), file_name='redirect.txt'))
+
+
+def nx_paths(source: str, target: str, k: int) -> List[List[str]]:
+    graph = nx.DiGraph((title, link) for title, links in GRAPH.items() for link in links)
+    return list(islice(nx.shortest_simple_paths(graph, source, target), k))
+
+
+def test_shortest_path_matches_networkx(path_query):
+    assert len(path_query.shortest_path('가', '마')) == len(nx_paths('가', '마', 1)[0])
+
+
+def test_k_shortest_paths_match_networkx(path_query):
+    every_path = nx_paths('가', '마', 100)
+    paths = path_query.k_shortest_paths('가', '마', k=100)
+    assert sorted(map(tuple, paths)) == sorted(map(tuple, every_path))
+    assert [len(path) for path in paths] == [len(path) for path in every_path]
+
+    paths = path_query.k_shortest_paths('가', '마', k=3)
+    assert [len(path) for path in paths] == [len(path) for path in every_path[:3]]
+    assert all(path in every_path for path in paths)
+
+
+def test_unreachable(path_query):
+    assert path_query.k_shortest_paths('마', '바') == []
+    assert path_query.k_shortest_paths('사', '가') == []
+    assert path_query.shortest_path('가', '사') == []
+
+
+def test_source_is_target(path_query):
+    assert path_query.k_shortest_paths('가', '가') == nx_paths('가', '가', 3) == [['가']]
+
+
+def test_redirected_endpoint(path_query):
+    assert path_query.k_shortest_paths('가', '마별칭', k=100) == path_query.k_shortest_paths('가', '마', k=100)
+    assert path_query.shortest_path('마별칭', '나') == ['마', '가', '나']
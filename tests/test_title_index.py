@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from linking import Indexer, RedirectResolver
+from mmap_file import StringTable, write_sections, open_sections
+from title_index import TitleIndex, RedirectIndex
+
+
+def test_empty_title_index_round_trip(tmp_path):
+    path = str(tmp_path / 'index.bin')
+    TitleIndex.build({}).save(path)
+    index = TitleIndex.open(path)
+    assert len(index) == 0
+    assert '가' not in index
+    assert dict(index.items()) == {}
+
+    indexer = Indexer(str(tmp_path), 'index.txt')
+    assert len(indexer.indexer) == 0
+
+
+def test_empty_redirect_index_round_trip(tmp_path):
+    path = str(tmp_path / 'redirect.bin')
+    RedirectIndex.build(RedirectResolver({})).save(path)
+    index = RedirectIndex.open(path)
+    assert len(index) == 0
+    assert dict(index) == {}
+    assert index.resolve('가') == ('가', ())
+
+
+def test_string_table_without_bytes(tmp_path):
+    path = str(tmp_path / 'strings.bin')
+    write_sections(path, StringTable.build(['']).sections('titles'), {})
+    sections, _ = open_sections(path)
+    titles = StringTable.from_sections(sections, 'titles')
+    assert list(titles) == ['']
+    assert titles.get('') == 0
+    assert titles.get('가') is None
+
+
+def test_title_index_round_trip(tmp_path):
+    path = str(tmp_path / 'index.bin')
+    TitleIndex.build({'가': '0:0:10', '나': '1:5:3'}).save(path)
+    index = TitleIndex.open(path)
+    assert dict(index.items()) == {'가': '0:0:10', '나': '1:5:3'}
+    assert index.location('나') == (1, 5, 3)
@@ -0,0 +1,86 @@
+import os
+import sys
+from typing import Dict, List
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_manager import FileManager
+from transform import TransformData
+
+
+def documents(texts: Dict[str, str]) -> List[Dict]:
+    return [{'namespace': 0, 'title': title, 'text': text} for title, text in texts.items()]
+
+
+def full_build(texts: Dict[str, str], file_manager: FileManager) -> TransformData:
+    transform_data = TransformData(documents(texts), file_manager=file_manager)
+    transform_data.to_text(directory=file_manager.dir_path)
+    file_manager.save_graph(transform_data.to_graph())
+    file_manager.save_build_state(transform_data.build_state())
+    return transform_data
+
+
+def test_update_matches_full_build(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    before: Dict[str, str] = {
+        '가': '[[나]] 와 [[다]] 를 본다',
+        '나': '#redirect 라',
+        '라': '#redirect 마',
+        '마': '[[가]] 로 돌아간다',
+        '바': '[[라]] 만 본다',
+        '사': '#redirect 아',
+        '아': '#redirect 사',
+        '자': '[[사]] 를 본다',
+        '차': '[[카]] 를 본다',
+        '카': '[[가]] 내용',
+        '파': '#redirect 하',
+        '하': '#redirect 거',
+        '거': '[[파]] 를 본다',
+        '너': '[[파]] 와 [[가]]',
+    }
+    after: Dict[str, str] = dict(before)
+    after['라'] = '[[마]] 로 바뀐 문서'     # 나를 거치는 redirect 경로가 짧아짐
+    after['하'] = '#redirect 더'           # 파를 거치는 redirect 경로 중간이 바뀜
+    after['더'] = '#redirect 거'
+    after['아'] = '#redirect 가'           # redirect cycle이 풀림
+    after['카'] = '#redirect 마'           # 문서가 redirect가 됨
+    del after['사']                        # 경로 중간의 redirect가 사라짐
+    after['타'] = '[[나]] 를 새로 본다'
+
+    old_directory, new_directory = tmp_path / 'old', tmp_path / 'new'
+    old_directory.mkdir()
+    new_directory.mkdir()
+    file_manager = FileManager(str(old_directory))
+    full_build(before, file_manager)
+
+    updated = TransformData(documents(after), file_manager=file_manager)
+    graph = updated.update(directory=file_manager.dir_path, build_state=file_manager.load_build_state())
+    rebuilt = full_build(after, FileManager(str(new_directory)))
+
+    assert graph == rebuilt.graph
+    assert updated.redirect == rebuilt.redirect
+    assert updated.build_state()['links'] == rebuilt.build_state()['links']
+
+    file_manager.save_graph(graph)
+    file_manager.save_build_state(updated.build_state())
+    unchanged = TransformData(documents(after), file_manager=file_manager)
+    assert unchanged.update(directory=file_manager.dir_path, build_state=file_manager.load_build_state()) == graph
+
+
+def test_failed_update_leaves_segments_unchanged(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    file_manager = FileManager(str(tmp_path))
+    full_build({'가': '[[나]] 내용', '나': '다른 내용'}, file_manager)
+    segments = {path.name: path.read_bytes() for path in tmp_path.glob('segment_*')}
+
+    def broken_dump():
+        yield {'namespace': 0, 'title': '가', 'text': '바뀐 내용 ' * 1000}
+        yield {'namespace': 0, 'title': '다', 'text': '새 문서'}
+        raise OSError('dump read failed')
+
+    updated = TransformData(broken_dump(), file_manager=file_manager)
+    with pytest.raises(OSError):
+        updated.update(directory=file_manager.dir_path, build_state=file_manager.load_build_state(), segment_size=1000)
+    assert {path.name: path.read_bytes() for path in tmp_path.glob('segment_*')} == segments
@@ -42,7 +42,7 @@ class TextMining:
         # print(tfidf.get_feature_names())
         # print(type(tfidf_vector))
 
-        self.save_tfidf(self.query, tfidf_vector)
+        self.save_tfidf(self.query, tfidf_vector, tfidf.get_feature_names_out())
         return tfidf_vector
 
     def _to_csr_matrix(self):
@@ -77,9 +77,9 @@ class TextMining:
         return query_graph
 
     @staticmethod
-    def save_tfidf(query: str, tfidf_vector: csr_matrix):
+    def save_tfidf(query: str, tfidf_vector: csr_matrix, vocabulary: List[str]):
         file_manager: FileManager = FileManager()
-        file_manager.save_tfidf(query, tfidf_vector)
+        file_manager.save_tfidf(query, tfidf_vector, vocabulary)
 
 
 def main():
@@ -87,4 +87,5 @@ def main():
     text_mining = TextMining(query=query)
 
 
-main()
+if __name__ == '__main__':
+    main()
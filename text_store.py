@@ -0,0 +1,144 @@
+from typing import Dict, List, Iterator, Tuple
+import mmap
+import os
+import re
+
+
+SEGMENT_PATTERN = re.compile(r'segment_(\d+)\.bin$')
+
+
+def segment_path(directory: str, segment: int) -> str:
+    return os.path.join(directory, 'segment_%d.bin' % segment)
+
+
+def format_location(segment: int, offset: int, length: int) -> str:
+    return '%d:%d:%d' % (segment, offset, length)
+
+
+def parse_location(location: str) -> Tuple[int, int, int]:
+    segment, offset, length = location.split(':')
+    return int(segment), int(offset), int(length)
+
+
+class TextStoreWriter:
+    """
+    document 텍스트를 segment 파일에 utf-8로 이어 쓰는 클래스.
+    document 하나당 파일 하나를 만드는 대신, segment_size를 넘으면 다음 segment 파일로 넘어간다.
+    append가 돌려주는 location('segment:offset:length')을 index.txt에 title과 함께 저장한다.
+    """
+    def __init__(self, directory: str, segment_size: int = 1024 * 1024 * 1024, segment: int = 0, offset: int = 0,
+                 buffer_size: int = 8 * 1024 * 1024) -> None:
+        """
+        :param directory: segment 파일을 저장할 directory path
+        :param segment_size: 한 segment 파일의 최대 byte 크기
+        :param segment: 이어 쓸 segment 번호. offset 뒤의 내용과 그 뒤 segment 파일은 지운다. (checkpoint에서 재개)
+        :param offset: 이어 쓸 segment의 byte offset
+        :param buffer_size: 파일 쓰기 buffer 크기
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.buffer_size = buffer_size
+        self.segment = segment
+        self.offset = offset
+
+        for existing in self.segments(directory):
+            if existing > segment:
+                os.remove(segment_path(directory, existing))
+        path = segment_path(directory, segment)
+        if os.path.exists(path):
+            os.truncate(path, offset)
+        elif offset:
+            raise ValueError(f'{path} does not exist')
+        self.segment_file = open(path, 'ab', buffering=buffer_size)
+
+    @classmethod
+    def append_to(cls, directory: str, segment_size: int = 1024 * 1024 * 1024) -> 'TextStoreWriter':
+        """
+        기존 store의 마지막 segment 끝에서 이어 쓰는 writer (incremental update)
+        """
+        segments: List[int] = cls.segments(directory)
+        segment = segments[-1] if segments else 0
+        offset = os.path.getsize(segment_path(directory, segment)) if segments else 0
+        return cls(directory, segment_size=segment_size, segment=segment, offset=offset)
+
+    def append(self, text: str) -> str:
+        data: bytes = text.encode('utf-8')
+        if self.offset and self.offset + len(data) > self.segment_size:
+            self.segment_file.close()
+            self.segment += 1
+            self.offset = 0
+            self.segment_file = open(segment_path(self.directory, self.segment), 'wb', buffering=self.buffer_size)
+        location = format_location(self.segment, self.offset, len(data))
+        self.segment_file.write(data)
+        self.offset += len(data)
+        return location
+
+    def flush(self):
+        self.segment_file.flush()
+
+    def close(self):
+        self.segment_file.close()
+
+    def __enter__(self) -> 'TextStoreWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @staticmethod
+    def segments(directory: str) -> List[int]:
+        matches = (SEGMENT_PATTERN.match(name) for name in os.listdir(directory))
+        return sorted(int(match.group(1)) for match in matches if match)
+
+
+class TextStore:
+    """
+    TextStoreWriter로 저장한 document를 읽는 클래스. segment 파일을 mmap 하므로 필요한 부분만 disk에서 읽힌다.
+    store[title] -> str, store.get_bytes(title) -> memoryview (복사 없이 mmap을 slicing)
+    iter_documents()는 segment 순서대로 읽어 text mining 처럼 전체를 순차적으로 훑을 때 사용한다.
+    """
+    def __init__(self, directory: str, index: Dict[str, str]) -> None:
+        """
+        :param directory: segment 파일이 있는 directory path
+        :param index: {title: location} (FileManager.load_index)
+        """
+        self.directory = directory
+        self.index: Dict[str, str] = index
+        self._segments: Dict[int, mmap.mmap] = {}
+
+    def __getitem__(self, title: str) -> str:
+        return str(self.get_bytes(title), 'utf-8')
+
+    def __contains__(self, title: str) -> bool:
+        return title in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get(self, title: str, default=None):
+        if title not in self.index:
+            return default
+        return self[title]
+
+    def get_bytes(self, title: str) -> memoryview:
+        segment, offset, length = parse_location(self.index[title])
+        return memoryview(self._mmap(segment))[offset:offset + length]
+
+    def iter_documents(self) -> Iterator[Tuple[str, str]]:
+        """
+        (title, text)를 segment, offset 순서대로 돌려준다.
+        """
+        locations = sorted((parse_location(location), title) for title, location in self.index.items())
+        for (segment, offset, length), title in locations:
+            yield title, self._mmap(segment)[offset:offset + length].decode('utf-8')
+
+    def close(self):
+        for segment_mmap in self._segments.values():
+            segment_mmap.close()
+        self._segments = {}
+
+    def _mmap(self, segment: int) -> mmap.mmap:
+        if segment not in self._segments:
+            with open(segment_path(self.directory, segment), 'rb') as segment_file:
+                self._segments[segment] = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._segments[segment]
@@ -0,0 +1,180 @@
+from typing import List, Dict, Iterator, Mapping, Tuple
+from collections.abc import Mapping as MappingABC
+
+import numpy as np
+
+from mmap_file import StringTable, write_sections, open_sections, typed_view
+from text_store import format_location, parse_location
+
+
+def read_pairs(path: str, separator: str) -> Iterator[Tuple[str, str]]:
+    """
+    index.txt('title\\tlocation'), redirect.txt('from\\t->\\tto')처럼 한 줄에 두 값을 separator로 나눈 파일을 읽는다.
+    형식이 맞지 않는 줄은 건너뛰지 않고 파일 이름과 줄 번호를 담아 ValueError를 낸다.
+    title이 없는 문서가 저장된 예전 index.txt도 읽을 수 있도록 key가 빈 문자열인 줄은 그대로 돌려준다.
+    :return: (key, value) iterator
+    """
+    with open(path, encoding='utf-8') as text_file:
+        for line_number, line in enumerate(text_file, 1):
+            pair: List[str] = line.rstrip('\n').split(separator)
+            if len(pair) != 2:
+                raise ValueError(f'{path}:{line_number}: malformed line {line.rstrip()!r}')
+            yield pair[0], pair[1]
+
+
+class TitleIndex(MappingABC):
+    """
+    index.txt({title: 'segment:offset:length'})를 StringTable과 location 배열로 저장한 title index.
+    save로 저장한 파일을 open하면 mmap으로 열리므로, index.txt를 한 줄씩 읽어 dict를 만드는 load 단계 없이 바로 조회한다.
+    index[title] -> location, title in index, index.location(title) -> (segment, offset, length)
+    """
+    def __init__(self, titles: StringTable, locations: np.ndarray) -> None:
+        """
+        :param titles: id -> title
+        :param locations: (n_titles, 3) int64 배열. id별 (segment, offset, length)
+        """
+        self.titles = titles
+        self.locations = locations
+        self._locations = typed_view(locations, 'q')
+
+    @classmethod
+    def build(cls, index: Mapping[str, str]) -> 'TitleIndex':
+        titles = StringTable.build(list(index.keys()))
+        locations = np.array([parse_location(location) for location in index.values()], dtype=np.int64)
+        return cls(titles, locations.reshape(len(titles), 3))
+
+    def save(self, path: str) -> None:
+        sections: Dict[str, np.ndarray] = self.titles.sections('titles')
+        sections['locations'] = self.locations
+        write_sections(path, sections, {'format': 'title_index'})
+
+    @classmethod
+    def open(cls, path: str) -> 'TitleIndex':
+        sections, meta = open_sections(path)
+        if meta.get('format') != 'title_index':
+            raise ValueError(f'{path} is not a title index file')
+        return cls(StringTable.from_sections(sections, 'titles'), sections['locations'])
+
+    def location(self, title: str) -> Tuple[int, int, int]:
+        title_id = self.titles.get(title)
+        if title_id is None:
+            raise KeyError(title)
+        return self._location(title_id)
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        for title_id in range(len(self.titles)):
+            yield self.titles[title_id], format_location(*self._location(title_id))
+
+    def _location(self, title_id: int) -> Tuple[int, int, int]:
+        return self._locations[3 * title_id], self._locations[3 * title_id + 1], self._locations[3 * title_id + 2]
+
+    def __getitem__(self, title: str) -> str:
+        return format_location(*self.location(title))
+
+    def __contains__(self, title) -> bool:
+        return title in self.titles
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.titles)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+
+class RedirectIndex(MappingABC):
+    """
+    redirect map과 그 closure(RedirectResolver)를 StringTable과 id 배열로 저장한 index.
+    title마다 바로 다음 redirect(next_ids)와 최종 link(target_ids), 거쳐간 alias(RedirectResolver.aliases)를 저장하므로
+    resolve는 redirect 경로를 따라가지 않고 alias_offsets[id]:alias_offsets[id + 1] 구간의 alias_ids를 바로 읽는다.
+    Mapping으로는 redirect map {from: to}이고, resolve는 RedirectResolver.resolve와 같다.
+    """
+    def __init__(self, titles: StringTable, next_ids: np.ndarray, target_ids: np.ndarray,
+                 alias_offsets: np.ndarray, alias_ids: np.ndarray) -> None:
+        """
+        :param titles: redirect에 등장하는 모든 title (from, to)
+        :param next_ids: id -> 바로 다음 redirect title id. redirect가 아니면 -1
+        :param target_ids: id -> 최종 link id. redirect가 아니면 -1
+        :param alias_offsets: (n_titles + 1) int64 배열. id의 alias는 alias_ids[alias_offsets[id]:alias_offsets[id + 1]]
+        :param alias_ids: 모든 title의 alias id를 이어 붙인 int32 배열
+        """
+        self.titles = titles
+        self.next_ids = next_ids
+        self.target_ids = target_ids
+        self.alias_offsets = alias_offsets
+        self.alias_ids = alias_ids
+        self._next_ids = typed_view(next_ids, 'i')
+        self._target_ids = typed_view(target_ids, 'i')
+        self._alias_offsets = typed_view(alias_offsets, 'q')
+        self._alias_ids = typed_view(alias_ids, 'i')
+        self._length = int(np.count_nonzero(next_ids >= 0))
+
+    @classmethod
+    def build(cls, resolver) -> 'RedirectIndex':
+        """
+        :param resolver: linking.RedirectResolver
+        """
+        titles: List[str] = list(resolver.redirect.keys())
+        vocabulary: Dict[str, int] = {title: i for i, title in enumerate(titles)}
+        for to_redirect in resolver.redirect.values():
+            if to_redirect not in vocabulary:
+                vocabulary[to_redirect] = len(titles)
+                titles.append(to_redirect)
+        next_ids = np.full(len(titles), -1, dtype=np.int32)
+        target_ids = np.full(len(titles), -1, dtype=np.int32)
+        alias_counts = np.zeros(len(titles), dtype=np.int64)
+        for from_redirect, to_redirect in resolver.redirect.items():
+            next_ids[vocabulary[from_redirect]] = vocabulary[to_redirect]
+            target_ids[vocabulary[from_redirect]] = vocabulary[resolver.target[from_redirect]]
+            alias_counts[vocabulary[from_redirect]] = len(resolver.aliases[from_redirect])
+        alias_offsets = np.zeros(len(titles) + 1, dtype=np.int64)
+        np.cumsum(alias_counts, out=alias_offsets[1:])
+        alias_ids = np.empty(alias_offsets[-1], dtype=np.int32)
+        for from_redirect in resolver.redirect:
+            start = alias_offsets[vocabulary[from_redirect]]
+            aliases: Tuple[str, ...] = resolver.aliases[from_redirect]
+            alias_ids[start:start + len(aliases)] = [vocabulary[alias] for alias in aliases]
+        return cls(StringTable.build(titles), next_ids, target_ids, alias_offsets, alias_ids)
+
+    def save(self, path: str) -> None:
+        sections: Dict[str, np.ndarray] = self.titles.sections('titles')
+        sections.update(next_ids=self.next_ids, target_ids=self.target_ids, alias_offsets=self.alias_offsets,
+                        alias_ids=self.alias_ids)
+        write_sections(path, sections, {'format': 'redirect_index'})
+
+    @classmethod
+    def open(cls, path: str) -> 'RedirectIndex':
+        sections, meta = open_sections(path)
+        if meta.get('format') != 'redirect_index':
+            raise ValueError(f'{path} is not a redirect index file')
+        if 'alias_ids' not in sections:
+            raise ValueError(f'{path}: redirect index without aliases, save it again with save_redirect_index')
+        return cls(StringTable.from_sections(sections, 'titles'), sections['next_ids'], sections['target_ids'],
+                   sections['alias_offsets'], sections['alias_ids'])
+
+    def resolve(self, link: str) -> Tuple[str, Tuple[str, ...]]:
+        """
+        :param link: 문서 title
+        :return: (최종 link, link부터 최종 link 직전까지 거쳐간 redirect link들). redirect가 아니면 (link, ())
+        """
+        title_id = self.titles.get(link)
+        if title_id is None or self._target_ids[title_id] < 0:
+            return link, ()
+        alias_ids = self._alias_ids[self._alias_offsets[title_id]:self._alias_offsets[title_id + 1]]
+        return self.titles[self._target_ids[title_id]], tuple(self.titles[alias_id] for alias_id in alias_ids)
+
+    def __getitem__(self, link: str) -> str:
+        title_id = self.titles.get(link)
+        if title_id is None or self._next_ids[title_id] < 0:
+            raise KeyError(link)
+        return self.titles[self._next_ids[title_id]]
+
+    def __contains__(self, link) -> bool:
+        title_id = self.titles.get(link)
+        return title_id is not None and self._next_ids[title_id] >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for title_id in np.flatnonzero(self.next_ids >= 0).tolist():
+            yield self.titles[title_id]
+
+    def __len__(self) -> int:
+        return self._length
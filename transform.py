@@ -1,10 +1,22 @@
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Iterable, Iterator, Tuple, Optional, Callable
+from collections import namedtuple
+from contextlib import ExitStack
+import hashlib
 import re
 import sys
 import os
 
 from tqdm import tqdm
 
+from linking import RedirectResolver
+from text_store import TextStoreWriter
+
+
+WikiMarkup = namedtuple('WikiMarkup', ['links', 'text', 'parents', 'children', 'relateds', 'category'])
+
+# typed edge의 relation 종류. relation이 없는 일반 link는 LINK로 취급한다.
+PARENT, CHILD, RELATED, CATEGORY, LINK = 'parent', 'child', 'related', 'category', 'link'
+
 
 class PatternMatching:
     """
@@ -57,98 +69,454 @@ class PatternMatching:
             line = line[1:].strip()
         return line
 
+    def scan(self, doc: str, links=True, text=True, hierarchy=True) -> WikiMarkup:
+        """
+        get_links, get_text, get_hierarchy의 결과를 한 번에 구하는 함수. 각 함수와 결과가 같다.
+        한 번에 document를 훑는 것은 아니고 결과마다 따로 훑지만, 줄 나누기는 한 번만 하고 각 결과를 줄 단위 대신 묶어서 처리한다.
+        - links: document 전체에 link_pattern을 한 번만 적용하고, 필터링과 정규화를 하나의 comprehension으로 처리
+        - text: 표, include 줄을 걸러낸 뒤 줄마다 clean()을 부르지 않고, 남은 줄 전체에 clean()의 치환을 한 번에 적용
+          url 치환은 'http'가 포함된 줄에만 clean()과 같은 방식으로 적용
+        - hierarchy: 상위/하위/관련 문서, 분류 표시가 있는 줄에서만 link_pattern을 적용
+        필요 없는 결과는 False로 끄면 계산하지 않고 None을 돌려준다.
+        :param doc: document 텍스트
+        :return: WikiMarkup(links, text, parents, children, relateds, category)
+        """
+        doc_links, doc_text = None, None
+        parents, children, relateds, category = None, None, None, None
+
+        if links:
+            doc_links = {link.strip().replace('분류:', '')
+                         for link in {link[2:].split('|')[0].replace(']]', '') for link in self.link_pattern.findall(doc)}
+                         if not self.url_pattern.match(link) and not self.file_pattern.match(link)}
+
+        if not (text or hierarchy):
+            return WikiMarkup(doc_links, doc_text, parents, children, relateds, category)
+        lines: List[str] = doc.split('\n')
+
+        if text:
+            kept_lines: List[str] = [line for line in lines if '||' not in line and '[include(' not in line]
+            kept: str = '\n'.join(kept_lines)
+            kept = kept.replace("'''", "").replace('|', ' ').replace('[*', '').replace('[', '').replace(']', '').replace(
+                '=', '').replace('\\', '').replace('-', '').replace('~', '').replace('(...)', '.')
+            doc_text = []
+            for line in (kept.split('\n') if kept_lines else []):
+                if 'http' in line:
+                    for url in self.url_pattern.findall(line):
+                        line = line.replace(url, ' ')
+                if line and (line[0] == '>' or line[0] == '*'):
+                    line = line[1:].strip()
+                doc_text.append(line)
+
+        if hierarchy:
+            parents, children, relateds, category = set(), set(), set(), set()
+            for line in lines:
+                is_parent = ' * 상위 문서 :' in line
+                is_child = ' * 하위 문서 :' in line
+                is_related = ' * 관련 문서 :' in line
+                is_category = '분류:' in line
+                if not (is_parent or is_child or is_related or is_category):
+                    continue
+                for link in self.link_pattern.findall(line):
+                    cleaned = link.replace('[', '').replace(']', '')
+                    if is_parent:
+                        parents.add(cleaned)
+                    if is_child:
+                        children.add(cleaned)
+                    if is_related:
+                        relateds.add(cleaned)
+                    if is_category:
+                        category.add(link.replace('분류:', '').replace('[', '').replace(']', '').strip())
+
+        return WikiMarkup(doc_links, doc_text, parents, children, relateds, category)
+
 
 class TransformData(PatternMatching):
     """
     전처리된 데이터를 이용하여 그래프, 텍스트 데이터로 변환하는 클래스
+    namuwiki는 List[Dict] 뿐만 아니라 ExtractWikiData 처럼 document를 stream으로 돌려주는 Iterable을 받을 수 있다.
+    transform은 namuwiki를 한 번만 순회하면서 텍스트, index, redirect, graph를 함께 만든다.
+    checkpoint_every > 0 이면 namuwiki.iter_shards로 shard 단위로 읽으며 주기적으로 진행 상태를 저장하고,
+    resume=True 이면 마지막 checkpoint에서 이어서 진행한다.
+    typed_edges=True 이면 상위/하위/관련 문서, 분류 link를 함께 구해 relations에 edge label로 저장한다.
     """
-    def __init__(self, namuwiki: List[Dict]) -> None:
+    def __init__(self, namuwiki: Iterable[Dict], buffer_size: int = 1000, file_manager=None,
+                 checkpoint_every: int = 0, resume: bool = False, typed_edges: bool = False) -> None:
+        """
+        :param namuwiki: document Iterable
+        :param buffer_size: 텍스트를 파일에 쓰기 전까지 모아두는 document 수
+        :param file_manager: checkpoint를 저장, 로드할 FileManager
+        :param checkpoint_every: checkpoint를 남기는 shard 간격 (0이면 checkpoint를 남기지 않음)
+        :param resume: 마지막 checkpoint에서 이어서 진행할지 여부
+        :param typed_edges: graph의 edge에 parent, child, related, category label을 붙일지 여부
+        """
         super().__init__()
-        self.namuwiki: List[Dict] = namuwiki
+        self.namuwiki: Iterable[Dict] = namuwiki
+        self.buffer_size = buffer_size
         self.redirect: Dict = {}
+        self.resolver: Optional[RedirectResolver] = None
         self.graph: Dict = {}
+        # {title: links} redirect alias를 붙이기 전 document의 link. incremental update에서 alias를 다시 계산할 때 쓴다.
+        self.links: Dict[str, Set[str]] = {}
+        self.typed_edges = typed_edges
+        # {title: {link: relation}} graph[title]의 edge 중 relation이 있는 edge의 label
+        self.relations: Dict[str, Dict[str, str]] = {}
+        self.hashes: Dict[str, bytes] = {}
+        self.n_saved = 0
+        self.transformed = False
 
-        self.n_docs = len(namuwiki)
+        self.n_docs = 0
         self.n_nodes = 0
         self.n_edges = 0
         self.node_degree: List[int] = []
 
+        self.file_manager = file_manager
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint: Optional[Dict] = None
+        if (checkpoint_every or resume) and file_manager is None:
+            raise ValueError('checkpoint를 사용하려면 file_manager가 필요합니다.')
+        if (checkpoint_every or resume) and not hasattr(namuwiki, 'iter_shards'):
+            raise ValueError('checkpoint는 iter_shards를 지원하는 document source에서만 사용할 수 있습니다.')
+        if resume:
+            self.checkpoint = file_manager.load_checkpoint()
+            if self.checkpoint is None:
+                sys.stdout.write('No checkpoint found, start from the beginning\n')
+
+    def to_text(self, directory, segment_size=1024 * 1024 * 1024):
+        """
+        텍스트를 전처리하고, redirect문서와 index 문서를 생성하는 함수
+        transform을 호출하므로 graph도 함께 만들어지고, 이후의 to_graph는 dump를 다시 읽지 않는다.
+        :param directory: directory path
+        :param segment_size: 한 segment 파일의 최대 byte 크기
+        :return:
+        """
+        self.transform(directory, segment_size=segment_size)
+        sys.stdout.write('\nTo Text PreProcessing & Parsing done')
+
     def to_graph(self) -> Dict:
-        for i, entity in enumerate(tqdm(self.namuwiki)):
-            title = entity.get('title', '')
-            if not title: continue
-
-            title_lower = title.lower()
-            if '.jpg' in title_lower or '.gif' in title_lower or '.png' in title_lower:
-                continue
-
-            links: Set = self.get_links(entity.get('text', ''))
-            if links:
-                linked_entities: Set = self._get_linked_entities(title, links)
-                self.graph[title] = linked_entities
-                len_linked_entities: int = len(linked_entities)
-                self.n_edges += len_linked_entities
-                self.n_nodes += 1
-                self.node_degree.append(len_linked_entities)
+        """
+        graph를 돌려준다. 아직 transform을 하지 않았으면 텍스트를 저장하지 않고 graph만 만든다.
+        :return: Dict graph
+        """
+        if not self.transformed:
+            self.transform()
+        sys.stdout.write('\nTo Graph Parsing done .. \n\n')
+        return self.graph
+
+    def transform(self, directory: Optional[str] = None, segment_size=1024 * 1024 * 1024) -> Dict:
+        """
+        namuwiki를 한 번만 순회하면서 텍스트, index, redirect와 graph의 adjacency를 함께 만드는 함수.
+        - 텍스트: 전처리된 텍스트는 buffer_size 만큼 모아서 TextStoreWriter로 segment 파일에 이어 쓰고, index에는 segment 내 위치를 저장
+        - graph: 순회하는 동안은 document의 link만 모아두고, redirect map이 완성된 뒤 finalize_graph에서 redirect link를 붙인다.
+        checkpoint에서 재개할 때는 index, redirect, segment 파일을 checkpoint 시점의 크기로 자른 뒤 이어서 쓴다.
+        :param directory: 텍스트, index, redirect를 저장할 directory path. None이면 graph만 만든다.
+        :param segment_size: 한 segment 파일의 최대 byte 크기
+        :return: Dict graph
+        """
+        n_saved = 0
+        segment, segment_offset = 0, 0
+        buffer: List[Tuple[str, str]] = []
+        mode = 'w'
+        self.n_docs = 0
+        if self._resume_stage() == 'transform':
+            n_saved = self.checkpoint['n_saved']
+            segment = self.checkpoint['segment']
+            segment_offset = self.checkpoint['segment_offset']
+            self.redirect = self.checkpoint['redirect']
+            self.hashes = self.checkpoint['hashes']
+            self.graph = self.checkpoint['graph']
+            self.relations = self.checkpoint['relations']
+            self.n_docs = self.checkpoint['n_docs']
+            mode = 'a'
+
+        with ExitStack() as stack:
+            writer, fi, fr = None, None, None
+            if directory is not None:
+                index_path = '%s/index.txt' % directory
+                redirect_path = '%s/redirect.txt' % directory
+                if mode == 'a':
+                    os.truncate(index_path, self.checkpoint['index_size'])
+                    os.truncate(redirect_path, self.checkpoint['redirect_size'])
+                writer = stack.enter_context(TextStoreWriter(directory, segment_size=segment_size, segment=segment,
+                                                             offset=segment_offset))
+                fi = stack.enter_context(open(index_path, mode, encoding='utf-8'))
+                fr = stack.enter_context(open(redirect_path, mode, encoding='utf-8'))
+
+            def save_checkpoint(offset: int):
+                checkpoint: Dict = {'stage': 'transform', 'offset': offset, 'n_saved': n_saved,
+                                    'segment': 0, 'segment_offset': 0, 'index_size': 0, 'redirect_size': 0,
+                                    'redirect': self.redirect, 'hashes': self.hashes, 'graph': self.graph,
+                                    'relations': self.relations, 'n_docs': self.n_docs}
+                if directory is not None:
+                    if buffer:
+                        self._flush_text(writer, buffer, fi)
+                    writer.flush()
+                    fi.flush()
+                    fr.flush()
+                    checkpoint.update({'segment': writer.segment, 'segment_offset': writer.offset,
+                                       'index_size': os.fstat(fi.fileno()).st_size,
+                                       'redirect_size': os.fstat(fr.fileno()).st_size})
+                self.file_manager.save_checkpoint(checkpoint)
+
+            for i, entity in enumerate(tqdm(self._iter_entities(save_checkpoint))):
+                self.n_docs += 1
+                doc = entity.get('text', '')
+                title = entity.get('title', '')
+                self.hashes[title] = self.content_hash(doc)
+
+                title_lower = title.lower()
+                is_node = bool(title) and not ('.jpg' in title_lower or '.gif' in title_lower or '.png' in title_lower)
+                markup: WikiMarkup = self.scan(doc, links=is_node, hierarchy=is_node and self.typed_edges)
+                if is_node and markup.links:
+                    self.graph.setdefault(title, set()).update(markup.links)
+                    if self.typed_edges:
+                        self._set_relations(title, markup)
+
+                text = ''.join(markup.text).strip()
+                # title이 없는 문서는 index, redirect에서 찾을 수 없으므로 저장하지 않는다.
+                if not text or not title:
+                    continue
+
+                if text[:9] == '#redirect':
+                    hyperlink = text[10:].strip()
+                    if fr is not None:
+                        fr.write('%s\t->\t%s\n' % (title, hyperlink))
+                    self.redirect[title] = hyperlink
+                    continue
+
+                n_saved += 1
+                if writer is not None:
+                    buffer.append((title, text))
+                    if len(buffer) >= self.buffer_size:
+                        self._flush_text(writer, buffer, fi)
+            if buffer:
+                self._flush_text(writer, buffer, fi)
+        self.n_saved = n_saved
+
+        self.finalize_graph()
+        self.transformed = True
+        return self.graph
+
+    def finalize_graph(self) -> None:
+        """
+        transform에서 모아둔 document의 link 중 redirect link에 redirect 경로의 link를 붙인다.
+        redirect map이 모두 만들어진 뒤 한 번만 수행하므로, 각 document를 다시 파싱할 필요가 없다.
+        """
+        resolver: RedirectResolver = self.get_resolver()
+        self.node_degree = []
+        self.links = {title: set(linked_entities) for title, linked_entities in self.graph.items()}
+        for title, linked_entities in self.graph.items():
+            for link in [link for link in linked_entities if link in resolver]:
+                linked_entities.update(resolver.aliases[link])
+            self.node_degree.append(len(linked_entities))
+        self.n_nodes = len(self.graph)
+        self.n_edges = sum(self.node_degree)
         sys.stdout.write(f'Total Docs: {self.n_docs}\n')
         sys.stdout.write(f'Total Nodes: {self.n_nodes}\n')
         sys.stdout.write(f'Total Edges: {self.n_edges}\n')
 
-        sys.stdout.write('\nTo Graph Parsing done .. \n\n')
-
-        return self.graph
+    def _set_relations(self, title: str, markup: WikiMarkup) -> None:
+        """
+        scan에서 구한 상위/하위/관련 문서, 분류 link를 graph의 link와 같은 형태로 정규화하여 relation label을 붙인다.
+        한 link가 여러 relation에 속하면 parent, child, related, category 순으로 앞의 것을 쓴다.
+        """
+        relations: Dict[str, str] = self.relations.get(title, {})
+        for relation, links in ((CATEGORY, markup.category), (RELATED, markup.relateds),
+                                (CHILD, markup.children), (PARENT, markup.parents)):
+            for link in links:
+                link = link.split('|')[0].strip().replace('분류:', '')
+                if link in markup.links:
+                    relations[link] = relation
+        if relations:
+            self.relations[title] = relations
 
-    def to_text(self, directory, max_num_files=10000):
+    def update(self, directory, build_state: Dict, segment_size=1024 * 1024 * 1024) -> Dict:
         """
-        텍스트를 전처리하고, redirect문서와 index 문서를 생성하는 함수
+        이전 build의 문서별 content hash와 비교하여 추가, 변경, 삭제된 문서만 다시 처리하는 incremental 모드.
+        추가, 변경된 문서의 텍스트는 text store의 마지막 segment 뒤에 이어 쓰고 index의 위치만 바꾼다.
+        (변경 전 텍스트는 segment에 남지만 index에서 더 이상 가리키지 않는다.)
+        graph와 redirect, index는 변경된 문서에 대해서만 고친 뒤 다시 저장한다.
+        redirect가 바뀐 경우, 변경되지 않은 문서 중 바뀌기 전이나 후의 redirect 경로가 바뀐 redirect를 지나는 link를 가진
+        문서는 저장해 둔 document의 link(build_state['links'])로부터 redirect alias를 다시 구한다.
         :param directory: directory path
-        :param max_num_files: max_num_files 수 만큼 한 폴더에 각 문서의 txt 파일 생성
-        :return:
+        :param build_state: 이전 build의 {'hashes', 'n_saved', 'links'}
+        :param segment_size: 한 segment 파일의 최대 byte 크기
+        :return: Dict graph
         """
-        n_saved = 0
-        subdirectory = 0
+        self.hashes = build_state['hashes']
+        self.n_saved = build_state['n_saved']
+        self.redirect = self.file_manager.load_redirect()
+        index: Dict[str, str] = self.file_manager.load_index()
+        self.graph = {title: set(links) for title, links in self.file_manager.load_graph().items()}
+        if 'links' in build_state:
+            self.links = build_state['links']
+        else:
+            sys.stdout.write('build_state has no document links, redirect aliases may be stale until a full build\n')
+            self.links = {title: set(links) for title, links in self.graph.items()}
+        previous_resolver = RedirectResolver(dict(self.redirect))
+
+        if self.typed_edges:
+            self.relations = self.file_manager.load_relations()
+        seen: Set[str] = set()
+        changed_links: Dict[str, WikiMarkup] = {}
+        changed_redirects: Set[str] = set()
+        n_added, n_changed = 0, 0
 
-        with open('%s/index.txt' % directory, 'w', encoding='utf-8') as fi:
-            with open('%s/redirect.txt' % directory, 'w', encoding='utf-8') as fr:
-                for i, entity in enumerate(tqdm(self.namuwiki)):
+        def remove_text(title: str):
+            if index.pop(title, None) is not None:
+                self.n_saved -= 1
+            if self.redirect.pop(title, None) is not None:
+                changed_redirects.add(title)
+
+        writer = TextStoreWriter.append_to(directory, segment_size=segment_size)
+        start_segment, start_offset = writer.segment, writer.offset
+        try:
+            with writer:
+                for entity in tqdm(self.namuwiki):
                     doc = entity.get('text', '')
-                    text = ''.join(self.get_text(doc)).strip()
-                    if not text:
+                    title = entity.get('title', '')
+                    seen.add(title)
+                    content_hash = self.content_hash(doc)
+                    previous_hash = self.hashes.get(title)
+                    if previous_hash == content_hash:
                         continue
+                    if previous_hash is None:
+                        n_added += 1
+                    else:
+                        n_changed += 1
+                    self.hashes[title] = content_hash
 
-                    title = entity.get('title', '')
+                    remove_text(title)
+                    changed_links[title] = self._scan_graph_links(title, doc)
 
+                    text = ''.join(self.scan(doc, links=False, hierarchy=False).text).strip()
+                    if not text or not title:
+                        continue
                     if text[:9] == '#redirect':
-                        hyperlink = text[10:].strip()
-                        fr.write('%s\t->\t%s\n' % (title, hyperlink))
-                        self.redirect[title] = hyperlink
+                        self.redirect[title] = text[10:].strip()
+                        changed_redirects.add(title)
                         continue
 
-                    with open('%s/%d/%d.txt' % (directory, subdirectory, n_saved), 'w', encoding='utf-8') as fo:
-                        fo.write('%s\n' % text)
+                    index[title] = writer.append(text)
+                    self.n_saved += 1
+        except BaseException:
+            # 중간에 실패하면 이번 update에서 이어 쓴 segment 내용을 지워 store를 update 전 상태로 되돌린다.
+            TextStoreWriter(directory, segment_size=segment_size, segment=start_segment, offset=start_offset).close()
+            raise
 
-                    fi.write('%s\t%s\n' % (title, '%d/%d' % (subdirectory, n_saved)))
+        # redirect map이 바뀌었으므로 closure를 다시 계산한다.
+        self.resolver = None
+        deleted: Set[str] = set(self.hashes) - seen
+        for title in deleted:
+            del self.hashes[title]
+            remove_text(title)
+            self.graph.pop(title, None)
+            self.links.pop(title, None)
+            self.relations.pop(title, None)
 
-                    n_saved += 1
-                    if n_saved % max_num_files == 0:
-                        subdirectory += 1
-                        if not os.path.exists('%s/%d/' % (directory, subdirectory)):
-                            os.makedirs('%s/%d/' % (directory, subdirectory))
+        for title, markup in changed_links.items():
+            self.graph.pop(title, None)
+            self.links.pop(title, None)
+            self.relations.pop(title, None)
+            if markup.links:
+                self.links[title] = set(markup.links)
+                self.graph[title] = self._get_linked_entities(title, markup.links)
+                if self.typed_edges:
+                    self._set_relations(title, markup)
+        if changed_redirects:
+            affected: Set[str] = self._redirected_through(previous_resolver, changed_redirects) | \
+                                 self._redirected_through(self.get_resolver(), changed_redirects)
+            for title, links in self.links.items():
+                if title in changed_links or links.isdisjoint(affected):
+                    continue
+                self.graph.pop(title, None)
+                self.graph[title] = self._get_linked_entities(title, links)
 
-        sys.stdout.write('\nTo Text PreProcessing & Parsing done')
+        self.file_manager.save_index(index)
+        self.file_manager.save_redirect(self.redirect)
+        self.n_nodes = len(self.graph)
+        self.n_edges = sum(len(linked_entities) for linked_entities in self.graph.values())
+        sys.stdout.write(f'Added Docs: {n_added}\n')
+        sys.stdout.write(f'Changed Docs: {n_changed}\n')
+        sys.stdout.write(f'Deleted Docs: {len(deleted)}\n')
+        sys.stdout.write(f'Total Nodes: {self.n_nodes}\n')
+        sys.stdout.write(f'Total Edges: {self.n_edges}\n')
+        return self.graph
+
+    def build_state(self) -> Dict:
+        """
+        다음 incremental update에 필요한 문서별 content hash, 저장된 문서 수, redirect alias를 붙이기 전 document의 link
+        """
+        return {'hashes': self.hashes, 'n_saved': self.n_saved, 'links': self.links}
+
+    @staticmethod
+    def _redirected_through(resolver: RedirectResolver, redirects: Set[str]) -> Set[str]:
+        """
+        :return: redirect 경로(거쳐가는 alias와 최종 link)가 redirects 중 하나를 지나는 link
+        """
+        return {link for link, aliases in resolver.aliases.items()
+                if resolver.target[link] in redirects or not redirects.isdisjoint(aliases)}
+
+    @staticmethod
+    def content_hash(doc: str) -> bytes:
+        return hashlib.blake2b(doc.encode('utf-8'), digest_size=16).digest()
+
+    def _scan_graph_links(self, title: str, doc: str) -> WikiMarkup:
+        """
+        to_graph와 같은 기준으로 graph에 들어갈 document의 link (typed_edges 이면 hierarchy 포함)를 구한다.
+        """
+        title_lower = title.lower()
+        if not title or '.jpg' in title_lower or '.gif' in title_lower or '.png' in title_lower:
+            return WikiMarkup(set(), None, None, None, None, None)
+        return self.scan(doc, text=False, hierarchy=self.typed_edges)
+
+    def _resume_stage(self) -> str:
+        return self.checkpoint['stage'] if self.checkpoint else ''
+
+    def _iter_entities(self, save_checkpoint: Callable[[int], None]) -> Iterator[Dict]:
+        """
+        namuwiki의 document를 순서대로 돌려준다.
+        checkpoint를 사용하면 shard 단위로 읽고, checkpoint_every 개의 shard를 처리할 때마다 save_checkpoint(다음 shard offset)를 호출한다.
+        save_checkpoint는 shard의 마지막 document가 처리된 뒤, 다음 document를 요청할 때 호출된다.
+        :param save_checkpoint: offset을 받아 현재 진행 상태를 저장하는 함수
+        """
+        if not (self.checkpoint_every or self.checkpoint):
+            yield from self.namuwiki
+            return
+
+        start_offset = self.checkpoint['offset'] if self._resume_stage() == 'transform' else 0
+        n_shards = 0
+        for offset, documents in self.namuwiki.iter_shards(start_offset):
+            yield from documents
+            n_shards += 1
+            if self.checkpoint_every and n_shards % self.checkpoint_every == 0:
+                save_checkpoint(offset)
+
+    @staticmethod
+    def _flush_text(writer: TextStoreWriter, buffer: List[Tuple[str, str]], index_file) -> None:
+        """
+        buffer에 모인 (title, text)를 text store와 index에 쓰고 buffer를 비운다.
+        """
+        for title, text in buffer:
+            index_file.write('%s\t%s\n' % (title, writer.append(text)))
+        buffer.clear()
 
     def _redirect_link(self, link: str) -> Set:
         """
         redirect가 필요한 link 중 여러 번 redirect 해야 하는 경우 최종 link로 연결
         redirect link 자체도 충분한 의미를 가지고 있으므로 이를 return
+        redirect 경로는 RedirectResolver로 미리 계산한 closure에서 찾는다.
 
         :return: str redirect_link
         """
-        redirect_links: Set = set()
-        while link in self.redirect:
-            redirect_links.add(link)
-            link = self.redirect[link]
-        return redirect_links
+        return set(self.get_resolver().resolve(link)[1])
+
+    def get_resolver(self) -> RedirectResolver:
+        """
+        현재 redirect map의 closure. redirect map이 다 만들어진 뒤(to_text 이후)에 처음 호출될 때 계산한다.
+        """
+        if self.resolver is None or self.resolver.redirect is not self.redirect:
+            self.resolver = RedirectResolver(self.redirect)
+        return self.resolver
 
     def _get_linked_entities(self, title: str, links: Set) -> Set:
         """
@@ -157,10 +525,10 @@ class TransformData(PatternMatching):
         :param links: List 문서에 걸려있는 links
         :return: Set redirect와 중복 제거한 links
         """
+        resolver: RedirectResolver = self.get_resolver()
         linked_entities: Set = self.graph.get(title, set())
         for link in links:
-            if link in self.redirect:
-                redirect_link: Set = self._redirect_link(link)
-                linked_entities.update(redirect_link)
+            if link in resolver:
+                linked_entities.update(resolver.aliases[link])
             linked_entities.add(link)
         return linked_entities